@@ -0,0 +1,207 @@
+"""
+In-process admission control for CPU-heavy endpoints (bcrypt in /auth).
+Per-IP and per-email token buckets reject bursts before any hashing work,
+and a global cap limits how many password hashes run at the same time;
+requests over the cap wait briefly in a bounded queue.
+
+The client IP comes from X-Forwarded-For only when the connection comes
+from one of TRUSTED_PROXIES (comma-separated addresses or CIDR ranges,
+e.g. the load balancer's network). Otherwise the header is ignored, so
+clients cannot pick their own rate limit key.
+"""
+
+import asyncio
+import ipaddress
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException, Request, status
+
+QUEUE_POLL_SECONDS = 0.01
+
+TRUSTED_PROXIES = [
+    ipaddress.ip_network(value.strip(), strict=False)
+    for value in os.getenv("TRUSTED_PROXIES", "").split(",")
+    if value.strip()
+]
+
+
+def _is_trusted_proxy(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in TRUSTED_PROXIES)
+
+
+def client_ip(request: Request) -> str | None:
+    """Address of the client, skipping the trusted proxies in X-Forwarded-For."""
+    peer = request.client.host if request.client else None
+    if peer is None or not _is_trusted_proxy(peer):
+        return peer
+    # Cada proxy añade a la derecha la dirección de quien le conectó
+    forwarded = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+    for hop in reversed(forwarded):
+        if not _is_trusted_proxy(hop):
+            return hop
+    return forwarded[0] if forwarded else peer
+
+
+class TokenBuckets:
+    """
+    Token buckets keyed by string. At most max_keys buckets are kept;
+    the least recently used one is evicted when the limit is reached.
+    """
+
+    def __init__(self, rate: float, capacity: float, max_keys: int):
+        self.rate = rate  # Tokens por segundo
+        self.capacity = capacity
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str) -> float:
+        """Consume one token. Returns 0 if allowed, or the seconds until the next token."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / self.rate
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class AdmissionController:
+    """Rate limits plus a concurrency cap for password hashing."""
+
+    def __init__(
+        self,
+        ip_rate: float,
+        ip_burst: float,
+        email_rate: float,
+        email_burst: float,
+        max_concurrent_hashes: int,
+        max_queued_hashes: int,
+        queue_timeout: float,
+        max_keys: int,
+    ):
+        self.ip_buckets = TokenBuckets(ip_rate, ip_burst, max_keys)
+        self.email_buckets = TokenBuckets(email_rate, email_burst, max_keys)
+        self.max_concurrent_hashes = max_concurrent_hashes
+        self.max_queued_hashes = max_queued_hashes
+        self.queue_timeout = queue_timeout
+        self._slots = threading.Semaphore(max_concurrent_hashes)
+        self.in_flight = 0
+        self.queued = 0
+        self.counters = Counter()
+        self._lock = threading.Lock()
+
+    def admit(self, ip: str | None, email: str | None = None):
+        """Reject with 429 when the client IP or the target email is over its rate."""
+        wait = self.ip_buckets.take(ip or "unknown")
+        if wait:
+            self.counters["rejected_ip"] += 1
+            self._too_many_requests(wait)
+
+        if email:
+            wait = self.email_buckets.take(email.lower())
+            if wait:
+                self.counters["rejected_email"] += 1
+                self._too_many_requests(wait)
+
+        self.counters["admitted"] += 1
+
+    @asynccontextmanager
+    async def hashing_slot(self):
+        """
+        Reserve one of the password hashing slots. When all are busy, wait up
+        to queue_timeout in a queue of at most max_queued_hashes requests;
+        reject with 503 when the queue is full or the wait times out.
+        """
+        acquired = self._slots.acquire(blocking=False)
+        if not acquired:
+            with self._lock:
+                if self.queued >= self.max_queued_hashes:
+                    self.counters["rejected_busy"] += 1
+                    self._server_busy()
+                self.queued += 1
+            try:
+                # Sondeo sin bloquear el event loop; cancelar la petición no deja un hueco tomado
+                deadline = time.monotonic() + self.queue_timeout
+                while not acquired and time.monotonic() < deadline:
+                    await asyncio.sleep(QUEUE_POLL_SECONDS)
+                    acquired = self._slots.acquire(blocking=False)
+            finally:
+                with self._lock:
+                    self.queued -= 1
+            if not acquired:
+                self.counters["rejected_timeout"] += 1
+                self._server_busy()
+            self.counters["queued"] += 1
+
+        with self._lock:
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            self._slots.release()
+            self.counters["hashes"] += 1
+
+    def metrics(self) -> dict:
+        return {
+            "admitted": self.counters["admitted"],
+            "rejected_ip": self.counters["rejected_ip"],
+            "rejected_email": self.counters["rejected_email"],
+            "rejected_busy": self.counters["rejected_busy"],
+            "rejected_timeout": self.counters["rejected_timeout"],
+            "queued": self.counters["queued"],
+            "hashes": self.counters["hashes"],
+            "hashes_in_flight": self.in_flight,
+            "hashes_waiting": self.queued,
+            "max_concurrent_hashes": self.max_concurrent_hashes,
+            "max_queued_hashes": self.max_queued_hashes,
+            "tracked_ips": len(self.ip_buckets),
+            "tracked_emails": len(self.email_buckets),
+        }
+
+    @staticmethod
+    def _too_many_requests(wait: float):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many attempts, try again later",
+            headers={"Retry-After": str(max(1, round(wait)))},
+        )
+
+    @staticmethod
+    def _server_busy():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server busy, try again",
+            headers={"Retry-After": "1"},
+        )
+
+
+auth_admission = AdmissionController(
+    ip_rate=float(os.getenv("AUTH_IP_RATE", "2")),
+    ip_burst=float(os.getenv("AUTH_IP_BURST", "40")),
+    email_rate=float(os.getenv("AUTH_EMAIL_RATE", "0.1")),
+    email_burst=float(os.getenv("AUTH_EMAIL_BURST", "5")),
+    max_concurrent_hashes=int(os.getenv("AUTH_MAX_CONCURRENT_HASHES", str(os.cpu_count() or 1))),
+    max_queued_hashes=int(os.getenv("AUTH_MAX_QUEUED_HASHES", str(4 * (os.cpu_count() or 1)))),
+    queue_timeout=float(os.getenv("AUTH_HASH_QUEUE_TIMEOUT", "2")),
+    max_keys=int(os.getenv("AUTH_LIMITER_MAX_KEYS", "100000")),
+)
@@ -0,0 +1,91 @@
+"""
+Compact storage and aggregation of per-question attempt answers.
+Each attempt stores its answers as packed arrays (one row per attempt),
+and statistics are computed with NumPy over those arrays.
+"""
+
+import numpy as np
+
+QUESTION_DTYPE = np.dtype("<i4")
+CHOICE_DTYPE = np.dtype("<i4")
+CORRECT_DTYPE = np.dtype("u1")
+
+# Filas de intentos procesadas por bloque al agregar
+AGGREGATE_CHUNK_SIZE = 5000
+
+
+def pack_answers(answers) -> tuple[bytes, bytes, bytes]:
+    """
+    Pack a list of (question_id, choice_id, is_correct) tuples into three
+    binary blobs ready to store in QuizAttemptAnswers.
+    """
+    question_ids = np.fromiter((a[0] for a in answers), dtype=QUESTION_DTYPE, count=len(answers))
+    choice_ids = np.fromiter((a[1] or 0 for a in answers), dtype=CHOICE_DTYPE, count=len(answers))
+    correct_flags = np.fromiter((a[2] for a in answers), dtype=CORRECT_DTYPE, count=len(answers))
+    return question_ids.tobytes(), choice_ids.tobytes(), correct_flags.tobytes()
+
+
+def _reduce_pairs(keys: np.ndarray, counts: np.ndarray, correct: np.ndarray):
+    """Sum counts and correct answers for each (question, choice) key."""
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    return (
+        unique_keys,
+        np.bincount(inverse, weights=counts, minlength=len(unique_keys)),
+        np.bincount(inverse, weights=correct, minlength=len(unique_keys)),
+    )
+
+
+def _chunk_pairs(rows):
+    """Decode a chunk of attempt rows into per-(question, choice) totals."""
+    questions = np.frombuffer(b"".join(r.question_ids for r in rows), dtype=QUESTION_DTYPE)
+    choices = np.frombuffer(b"".join(r.choice_ids for r in rows), dtype=CHOICE_DTYPE)
+    correct = np.frombuffer(b"".join(r.correct_flags for r in rows), dtype=CORRECT_DTYPE)
+
+    # Clave única por par: question_id en los 32 bits altos, choice_id en los bajos
+    keys = (questions.astype(np.int64) << 32) | choices.astype(np.int64)
+    return _reduce_pairs(keys, np.ones(len(keys)), correct.astype(np.float64))
+
+
+def aggregate_answers(rows) -> tuple[int, dict]:
+    """
+    Aggregate an iterable of QuizAttemptAnswers rows.
+
+    Returns the number of attempts and, per question_id, a dict with the
+    answer count, the correct count and the choice distribution
+    ({choice_id: count}). Rows are processed in fixed-size chunks, so memory
+    depends on the number of distinct (question, choice) pairs, not attempts.
+    """
+    attempts = 0
+    parts = []
+    chunk = []
+    for row in rows:
+        attempts += 1
+        chunk.append(row)
+        if len(chunk) >= AGGREGATE_CHUNK_SIZE:
+            parts.append(_chunk_pairs(chunk))
+            chunk = []
+    if chunk:
+        parts.append(_chunk_pairs(chunk))
+
+    if not parts:
+        return attempts, {}
+
+    keys, counts, correct = _reduce_pairs(
+        np.concatenate([p[0] for p in parts]),
+        np.concatenate([p[1] for p in parts]),
+        np.concatenate([p[2] for p in parts]),
+    )
+
+    question_ids = keys >> 32
+    choice_ids = keys & 0xFFFFFFFF
+
+    result: dict[int, dict] = {}
+    for question_id, choice_id, count, n_correct in zip(
+        question_ids.tolist(), choice_ids.tolist(), counts.tolist(), correct.tolist()
+    ):
+        stats = result.setdefault(question_id, {"answers": 0, "correct": 0, "choices": {}})
+        stats["answers"] += int(count)
+        stats["correct"] += int(n_correct)
+        stats["choices"][choice_id] = int(count)
+
+    return attempts, result
@@ -3,12 +3,13 @@ import bcrypt
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from typing import Annotated
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, Response, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from dotenv import load_dotenv
 
 from database import session_local
+from replica import replica_router, WRITE_MARKER_HEADER, WRITE_MARKER_COOKIE
 import models
 from schemas.user import TokenData
 
@@ -27,8 +28,10 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 
-def get_db():
+def get_db(response: Response):
     db = session_local()
+    # Al confirmar una escritura del usuario se añade su marca de escritura a la respuesta
+    db.info["response"] = response
     try:
         yield db
     finally:
@@ -38,6 +41,28 @@ def get_db():
 db_dependency = Annotated[Session, Depends(get_db)]
 
 
+def get_read_db(token: Annotated[str, Depends(oauth2_scheme)], request: Request):
+    """
+    Sesión para endpoints de solo lectura: réplica si está configurada y al día.
+    La marca de escritura del cliente (cabecera o cookie) obliga a leer del primario
+    hasta que la réplica haya aplicado esa escritura.
+    """
+    try:
+        user_id = int(jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub"))
+    except (JWTError, TypeError, ValueError):
+        user_id = None  # get_current_user rechazará el token
+
+    marker = request.headers.get(WRITE_MARKER_HEADER) or request.cookies.get(WRITE_MARKER_COOKIE)
+    db = replica_router.session_factory(user_id, marker)()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+read_db_dependency = Annotated[Session, Depends(get_read_db)]
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     password_bytes = plain_password.encode('utf-8')
     hashed_bytes = hashed_password.encode('utf-8')
@@ -83,6 +108,9 @@ async def get_current_user(
     user = db.query(models.Users).filter(models.Users.id == token_data.user_id).first()
     if user is None:
         raise credentials_exception
+
+    # Para enrutar sus lecturas al primario justo después de que escriba
+    db.info["user_id"] = user.id
     return user
 
 
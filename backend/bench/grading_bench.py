@@ -0,0 +1,121 @@
+"""
+Benchmark of attempt grading (grading.AnswerKey, POST /quizzes/{id}/grade).
+
+Imports a generated quiz with a mix of option and text questions, then
+grades attempts of it twice: in-process with AnswerKey.grade (no database)
+and through the endpoint, which also loads the answer key. Prints graded
+answers per second for each. A share of the text answers can be misspelled
+to exercise the typo-tolerant path. Uses a fresh SQLite database unless
+DATABASE_URL is set.
+
+    python bench/grading_bench.py --questions 1000 --attempts 200 --max-typos 2 --misspelled 0.5
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+os.environ.setdefault("SECRET_KEY", "bench")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from database import session_local  # noqa: E402
+from grading import AnswerKey  # noqa: E402
+from schemas.quiz import GradeAnswer  # noqa: E402
+import main  # noqa: E402
+
+ANSWERS = ["Río de la Plata", "Cordillera de los Andes", "Tiahuanaco", "Lago Titicaca", "Machu Picchu"]
+
+
+def generate_quiz(questions: int, text_share: float, rng: random.Random) -> bytes:
+    items = []
+    for i in range(questions):
+        if rng.random() < text_share:
+            items.append({
+                "question_text": f"Pregunta {i}",
+                "answer_type": "text",
+                "choices": [{"choice_text": rng.choice(ANSWERS), "is_correct": True}]
+            })
+        else:
+            items.append({
+                "question_text": f"Pregunta {i}",
+                "choices": [{"choice_text": f"Opción {k}", "is_correct": k == 0} for k in range(4)]
+            })
+    return json.dumps({"title": "Grading bench", "questions": items}).encode()
+
+
+def misspell(text: str, rng: random.Random) -> str:
+    position = rng.randrange(len(text))
+    return text[:position] + text[position + 1:]
+
+
+def generate_attempt(quiz: dict, misspelled: float, rng: random.Random) -> list[dict]:
+    answers = []
+    for question in quiz["questions"]:
+        choices = question["choices"]
+        if question["answer_type"] == "text":
+            text = choices[0]["choice_text"].upper()
+            answers.append({
+                "question_id": question["id"],
+                "text": misspell(text, rng) if rng.random() < misspelled else text
+            })
+        else:
+            answers.append({"question_id": question["id"], "choice_id": rng.choice(choices)["id"]})
+    return answers
+
+
+def report(label: str, answers: int, elapsed: float):
+    print(f"{label:<10} {elapsed:8.2f} s   {answers / elapsed:12,.0f} answers/s")
+
+
+def run(questions: int, attempts: int, text_share: float, misspelled: float, max_typos: int, seed: int):
+    rng = random.Random(seed)
+    client = TestClient(main.app)
+    client.post("/auth/register", json={"email": "bench@example.com", "password": "bench", "name": "Bench"})
+    token = client.post("/auth/login", json={"email": "bench@example.com", "password": "bench"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    client.post("/quizzes/import", content=generate_quiz(questions, text_share, rng), headers=headers).raise_for_status()
+    quiz_id = max(q["id"] for q in client.get("/quizzes/", headers=headers).json())
+    quiz = client.get(f"/quizzes/{quiz_id}", headers=headers).json()
+    bodies = [generate_attempt(quiz, misspelled, rng) for _ in range(attempts)]
+    total = questions * attempts
+    print(f"quiz: {questions} questions ({text_share:.0%} text), {attempts} attempts, "
+          f"{misspelled:.0%} of text answers misspelled, max_typos={max_typos}")
+
+    db = session_local()
+    try:
+        answer_key = AnswerKey.load(db, quiz_id)
+    finally:
+        db.close()
+    parsed = [[GradeAnswer(**answer) for answer in body] for body in bodies]
+    start = time.perf_counter()
+    correct = sum(answer_key.grade(answers, max_typos).correct_answers for answers in parsed)
+    report("in-process", total, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for body in bodies:
+        response = client.post(
+            f"/quizzes/{quiz_id}/grade", params={"max_typos": max_typos}, json={"answers": body}, headers=headers
+        )
+        response.raise_for_status()
+    report("endpoint", total, time.perf_counter() - start)
+    print(f"correct: {correct / total:.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Attempt grading benchmark")
+    parser.add_argument("--questions", type=int, default=1000)
+    parser.add_argument("--attempts", type=int, default=200)
+    parser.add_argument("--text-share", type=float, default=0.5, help="fraction of text questions")
+    parser.add_argument("--misspelled", type=float, default=0.0, help="fraction of text answers with one typo")
+    parser.add_argument("--max-typos", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(args.questions, args.attempts, args.text_share, args.misspelled, args.max_typos, args.seed)
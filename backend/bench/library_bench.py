@@ -0,0 +1,95 @@
+"""
+Benchmark of the NDJSON library export and import (/quizzes/export, /quizzes/import).
+
+Registers a user, imports a generated library and streams it back, printing
+the wall time of each step and, with --trace-memory, its peak Python memory
+(tracing slows the run down noticeably). Uses a fresh SQLite database unless
+DATABASE_URL is set.
+
+    python bench/library_bench.py --quizzes 500 --questions 100 --choices 3
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+os.environ.setdefault("SECRET_KEY", "bench")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import main  # noqa: E402
+
+
+def generate_library(quizzes: int, questions: int, choices: int) -> bytes:
+    lines = []
+    for i in range(quizzes):
+        lines.append(json.dumps({
+            "title": f"Quiz {i}",
+            "questions": [
+                {
+                    "question_text": f"Pregunta {i}-{j}",
+                    "choices": [
+                        {"choice_text": f"Opción {k}", "is_correct": k == 0}
+                        for k in range(choices)
+                    ]
+                }
+                for j in range(questions)
+            ]
+        }))
+    return "\n".join(lines).encode()
+
+
+def measure(label: str, step, trace_memory: bool):
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    result = step()
+    elapsed = time.perf_counter() - start
+    memory = ""
+    if trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        memory = f"   peak {peak / 2**20:8.1f} MiB"
+    print(f"{label:<8} {elapsed:8.2f} s{memory}   {result}")
+
+
+def run(quizzes: int, questions: int, choices: int, trace_memory: bool = False):
+    client = TestClient(main.app)
+    client.post("/auth/register", json={"email": "bench@example.com", "password": "bench", "name": "Bench"})
+    token = client.post("/auth/login", json={"email": "bench@example.com", "password": "bench"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    body = generate_library(quizzes, questions, choices)
+    print(f"library: {quizzes} quizzes, {quizzes * questions} questions, "
+          f"{quizzes * questions * choices} choices, {len(body) / 2**20:.1f} MiB")
+
+    def import_library():
+        response = client.post("/quizzes/import", content=body, headers=headers)
+        response.raise_for_status()
+        return response.json()
+
+    def export_library():
+        lines = 0
+        with client.stream("GET", "/quizzes/export", headers=headers) as response:
+            for _ in response.iter_lines():
+                lines += 1
+        return f"{lines} lines"
+
+    measure("import", import_library, trace_memory)
+    measure("export", export_library, trace_memory)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Library export/import benchmark")
+    parser.add_argument("--quizzes", type=int, default=500)
+    parser.add_argument("--questions", type=int, default=100)
+    parser.add_argument("--choices", type=int, default=3)
+    parser.add_argument("--trace-memory", action="store_true", help="report peak Python memory per step")
+    args = parser.parse_args()
+    run(args.quizzes, args.questions, args.choices, args.trace_memory)
@@ -0,0 +1,144 @@
+"""
+Load test of a live quiz room (WebSocket /share/code/{code}/live).
+
+Seeds a fresh SQLite database with a host, a shared quiz and N players,
+starts uvicorn on it, connects every player, runs the quiz question by
+question and prints the fan-out latency of each question (time from the
+host's "next" until each player receives it) and the final leaderboard.
+
+    python bench/live_load.py --players 1000 --questions 5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "live_bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ.setdefault("SECRET_KEY", "bench")
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+import websockets  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from auth import create_access_token  # noqa: E402
+import main  # noqa: E402
+
+FIRST_PLAYER_ID = 1000
+
+
+def seed(players: int, questions: int):
+    """Create the host, the quiz and its share code through the API; players directly in the database."""
+    client = TestClient(main.app)
+    client.post("/auth/register", json={"email": "host@example.com", "password": "bench", "name": "Host"})
+    token = client.post("/auth/login", json={"email": "host@example.com", "password": "bench"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    quiz = client.post("/quizzes/", json={"title": "Live"}, headers=headers).json()
+    created = [
+        client.post(f"/quizzes/{quiz['id']}/questions/", json={
+            "question_text": f"Pregunta {i}",
+            "choices": [{"choice_text": "a", "is_correct": True}, {"choice_text": "b", "is_correct": False}]
+        }, headers=headers).json()
+        for i in range(questions)
+    ]
+    code = client.post(f"/share/{quiz['id']}/generate-code", headers=headers).json()["share_code"]
+
+    with sqlite3.connect(DB_PATH) as db:
+        db.executemany(
+            "INSERT INTO users (id, email, hashed_password, name) VALUES (?, ?, 'x', ?)",
+            [(FIRST_PLAYER_ID + i, f"player{i}@example.com", f"Player {i}") for i in range(players)]
+        )
+    return token, code, created
+
+
+async def run(players: int, questions: int, interval: float, port: int):
+    token, code, created = seed(players, questions)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND, env=os.environ
+    )
+    try:
+        url = f"ws://127.0.0.1:{port}/share/code/{code}/live?token="
+        for _ in range(50):
+            try:
+                host = await websockets.connect(url + token)
+                break
+            except OSError:
+                await asyncio.sleep(0.2)
+        else:
+            raise RuntimeError("server did not start")
+        await host.recv()
+
+        async def connect(i):
+            websocket = await websockets.connect(
+                url + create_access_token({"sub": str(FIRST_PLAYER_ID + i)}), max_queue=None
+            )
+            await websocket.recv()
+            return websocket
+
+        start = time.perf_counter()
+        sockets = await asyncio.gather(*(connect(i) for i in range(players)))
+        print(f"{players} players connected in {time.perf_counter() - start:.2f} s")
+
+        received: dict[int, list[float]] = {}
+
+        async def play(i, websocket):
+            async for raw in websocket:
+                message = json.loads(raw)
+                if message["type"] == "question":
+                    received.setdefault(message["index"], []).append(time.perf_counter())
+                    # La mitad de los jugadores acierta cada pregunta
+                    choice = created[message["index"]]["choices"][i % 2]["id"]
+                    await websocket.send(json.dumps({"type": "answer", "choice_id": choice}))
+                elif message["type"] == "ended":
+                    return message
+
+        async def drain_host():
+            async for _ in host:
+                pass
+
+        games = [asyncio.create_task(play(i, websocket)) for i, websocket in enumerate(sockets)]
+        drain = asyncio.create_task(drain_host())
+        sent = {}
+        for index in range(questions):
+            sent[index] = time.perf_counter()
+            await host.send(json.dumps({"type": "next"}))
+            await asyncio.sleep(interval)
+        await host.send(json.dumps({"type": "next"}))
+        results = await asyncio.gather(*games)
+        drain.cancel()
+
+        for index in range(questions):
+            latencies = sorted(moment - sent[index] for moment in received.get(index, []))
+            if not latencies:
+                print(f"question {index}: not received")
+                continue
+            print(
+                f"question {index}: received by {len(latencies)}  "
+                f"p50 {latencies[len(latencies) // 2] * 1000:.0f} ms  "
+                f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.0f} ms  "
+                f"max {latencies[-1] * 1000:.0f} ms"
+            )
+        final = next((result for result in results if result), None)
+        if final:
+            print(f"final: {final['players']} players, top {final['top'][:3]}")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Live room load test")
+    parser.add_argument("--players", type=int, default=1000)
+    parser.add_argument("--questions", type=int, default=5)
+    parser.add_argument("--interval", type=float, default=1.5, help="seconds between questions")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    asyncio.run(run(args.players, args.questions, args.interval, args.port))
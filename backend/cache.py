@@ -0,0 +1,196 @@
+"""
+In-process response cache with cross-worker invalidation.
+
+Write paths call invalidate(db, *keys). The keys are sent with NOTIFY inside
+the committing transaction (Postgres), so every worker's listener evicts them
+once the change is visible. On other databases (SQLite in local runs) only the
+local cache is evicted after commit.
+"""
+
+import json
+import os
+import select
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from database import engine
+
+CHANNEL = "cache_invalidation"
+
+
+class LocalCache:
+    """Thread-safe LRU cache with a TTL per entry."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, object]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._evictions = 0
+        self.hits = 0
+        self.misses = 0
+
+    def begin(self) -> int:
+        """Token to pass to set(); a read that raced with an eviction is not stored."""
+        return self._evictions
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value, token: int):
+        with self._lock:
+            if token != self._evictions:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def evict(self, keys):
+        with self._lock:
+            self._evictions += 1
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._evictions += 1
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+response_cache = LocalCache(
+    max_entries=int(os.getenv("CACHE_MAX_ENTRIES", "2000")),
+    ttl=float(os.getenv("CACHE_TTL_SECONDS", "300")),
+)
+
+# Métricas del bus de invalidación
+bus_metrics = {
+    "sent": 0,
+    "received": 0,
+    "last_lag_seconds": 0.0,
+    "max_lag_seconds": 0.0,
+    "listener_running": False,
+}
+
+
+# Funciones llamadas con las claves evictadas (locales o de otros workers),
+# o con None cuando se pudieron perder mensajes y todo debe darse por cambiado
+_eviction_listeners = []
+
+
+def on_evict(callback):
+    """Register a callback for evicted keys; used by caches kept outside response_cache."""
+    _eviction_listeners.append(callback)
+    return callback
+
+
+def _evicted(keys):
+    if keys is None:
+        response_cache.clear()
+    else:
+        response_cache.evict(keys)
+    for callback in _eviction_listeners:
+        callback(keys)
+
+
+def quiz_keys(quiz) -> list[str]:
+    """Cache keys that depend on a quiz (its tree and its share code)."""
+    keys = [f"quiz:{quiz.id}"]
+    if quiz.share_code:
+        keys.append(f"share:{quiz.share_code}")
+    return keys
+
+
+def invalidate(db: Session, *keys: str):
+    """Schedule cache keys for eviction when the session's transaction commits."""
+    db.info.setdefault("invalidate", set()).update(keys)
+
+
+@event.listens_for(Session, "before_commit")
+def _notify_before_commit(session: Session):
+    keys = session.info.get("invalidate")
+    if not keys or session.get_bind().dialect.name != "postgresql":
+        return
+    payload = json.dumps({"keys": sorted(keys), "sent_at": time.time()})
+    # pg_notify dentro de la transacción: se entrega solo si el commit tiene éxito
+    session.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": CHANNEL, "payload": payload})
+    bus_metrics["sent"] += 1
+
+
+@event.listens_for(Session, "after_commit")
+def _evict_after_commit(session: Session):
+    keys = session.info.pop("invalidate", None)
+    if keys:
+        _evicted(keys)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session):
+    session.info.pop("invalidate", None)
+
+
+def _handle_notification(payload: str):
+    message = json.loads(payload)
+    _evicted(message["keys"])
+    lag = max(0.0, time.time() - message["sent_at"])
+    bus_metrics["received"] += 1
+    bus_metrics["last_lag_seconds"] = lag
+    bus_metrics["max_lag_seconds"] = max(bus_metrics["max_lag_seconds"], lag)
+
+
+def _listen_forever(stop: threading.Event):
+    while not stop.is_set():
+        try:
+            raw = engine.raw_connection()
+            try:
+                conn = raw.driver_connection
+                conn.autocommit = True
+                conn.cursor().execute(f"LISTEN {CHANNEL}")
+                bus_metrics["listener_running"] = True
+                # Al reconectar se pudieron perder mensajes: vaciar la caché local
+                _evicted(None)
+                while not stop.is_set():
+                    if select.select([conn], [], [], 1.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        _handle_notification(conn.notifies.pop(0).payload)
+            finally:
+                bus_metrics["listener_running"] = False
+                raw.invalidate()
+        except Exception as e:
+            print(f"[Cache] Listener error: {e}")
+            stop.wait(5)
+
+
+def start_listener() -> threading.Event | None:
+    """Start the background LISTEN thread (Postgres only). Returns its stop event."""
+    if engine.dialect.name != "postgresql":
+        return None
+    stop = threading.Event()
+    threading.Thread(target=_listen_forever, args=(stop,), daemon=True, name="cache-listener").start()
+    return stop
+
+
+def metrics() -> dict:
+    return {
+        **bus_metrics,
+        "entries": len(response_cache),
+        "hits": response_cache.hits,
+        "misses": response_cache.misses,
+    }
@@ -1,6 +1,7 @@
 import os
+from contextlib import contextmanager
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 
@@ -16,6 +17,29 @@ engine = create_engine(DATABASE_URL)
 
 session_local = sessionmaker(autocommit=False,autoflush=False, bind=engine)
 
+# Réplica de solo lectura opcional para los endpoints GET
+READ_REPLICA_URL = os.getenv('READ_REPLICA_URL')
+
+replica_engine = create_engine(READ_REPLICA_URL) if READ_REPLICA_URL else None
+
+replica_session_local = (
+    sessionmaker(autocommit=False, autoflush=False, bind=replica_engine) if replica_engine else None
+)
+
 Base = declarative_base()
 
 
+@contextmanager
+def advisory_lock(conn, name: str):
+    """
+    Hold a session-level pg_advisory_lock while the block runs, so only one
+    worker at a time does the work. No-op on databases without advisory locks.
+    """
+    if conn.dialect.name != "postgresql":
+        yield
+        return
+    conn.execute(text("SELECT pg_advisory_lock(hashtext(:name))"), {"name": name})
+    try:
+        yield
+    finally:
+        conn.execute(text("SELECT pg_advisory_unlock(hashtext(:name))"), {"name": name})
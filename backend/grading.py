@@ -0,0 +1,194 @@
+"""
+Server-side grading of quiz attempts, including free-text answers.
+
+Accepted text answers are compared in normalized form: case folded,
+accents stripped, punctuation dropped and whitespace collapsed. The
+normalized form of every choice is stored in Choices.normalized_text
+when it is written, so grading only normalizes the player's answer.
+Optional typo tolerance accepts answers within a small edit distance,
+checked with a banded Levenshtein that stops as soon as the bound is exceeded.
+Attempts played from a published snapshot are graded against that snapshot,
+so later edits of the quiz do not change their result. Saved attempts are
+graded the same way, so analytics never store a client-reported result.
+"""
+
+import json
+import re
+import unicodedata
+from collections import OrderedDict
+
+from sqlalchemy.orm import Session
+
+from schemas.quiz import GradeAnswer, GradeResult, GradeResponse
+from snapshots import get_snapshot_content
+import models
+
+MAX_TYPOS = 2
+
+# Claves de corrección de snapshots que se conservan (los snapshots no cambian)
+SNAPSHOT_KEYS = 32
+
+_snapshot_keys: OrderedDict[str, "AnswerKey"] = OrderedDict()
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def normalize_answer(text: str) -> str:
+    """Casefold, strip accents, turn punctuation into spaces and collapse whitespace."""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(_NON_WORD.sub(" ", stripped).split())
+
+
+def within_distance(a: str, b: str, max_distance: int) -> bool:
+    """True if the Levenshtein distance between a and b is at most max_distance."""
+    if abs(len(a) - len(b)) > max_distance:
+        return False
+    if a == b:
+        return True
+    if len(a) > len(b):
+        a, b = b, a
+    # Solo se calculan las celdas a max_distance de la diagonal
+    big = max_distance + 1
+    previous = [j if j <= max_distance else big for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        low = max(1, i - max_distance)
+        high = min(len(b), i + max_distance)
+        current = [big] * (len(b) + 1)
+        current[0] = i if i <= max_distance else big
+        char = a[i - 1]
+        row_min = current[0]
+        for j in range(low, high + 1):
+            cost = previous[j - 1] + (char != b[j - 1])
+            cost = min(cost, previous[j] + 1, current[j - 1] + 1)
+            current[j] = cost
+            row_min = min(row_min, cost)
+        if row_min > max_distance:
+            return False
+        previous = current
+    return previous[len(b)] <= max_distance
+
+
+def is_accepted(answer: str, accepted: frozenset[str], max_typos: int = 0) -> bool:
+    """Match a normalized answer against the normalized accepted answers."""
+    if answer in accepted:
+        return True
+    if max_typos <= 0 or not answer:
+        return False
+    for expected in accepted:
+        # Respuestas cortas: un solo error ya cambia la palabra
+        allowed = min(max_typos, len(expected) // 4)
+        if allowed and within_distance(answer, expected, allowed):
+            return True
+    return False
+
+
+class AnswerKey:
+    """Choice ids, correct choice ids and normalized accepted texts of every question in a quiz."""
+
+    def __init__(self, rows, quiz_id: int | None = None):
+        self.quiz_id = quiz_id
+        self.answer_types: dict[int, str] = {}
+        choices: dict[int, set[int]] = {}
+        correct_choices: dict[int, set[int]] = {}
+        correct_texts: dict[int, set[str]] = {}
+        for question_id, answer_type, choice_id, is_correct, normalized_text, choice_text in rows:
+            self.answer_types[question_id] = answer_type
+            if choice_id is None:
+                continue
+            choices.setdefault(question_id, set()).add(choice_id)
+            if not is_correct:
+                continue
+            correct_choices.setdefault(question_id, set()).add(choice_id)
+            text = normalized_text if normalized_text is not None else normalize_answer(choice_text or "")
+            correct_texts.setdefault(question_id, set()).add(text)
+        self.choices = {q: frozenset(ids) for q, ids in choices.items()}
+        self.correct_choices = {q: frozenset(ids) for q, ids in correct_choices.items()}
+        self.correct_texts = {q: frozenset(texts) for q, texts in correct_texts.items()}
+
+    @classmethod
+    def load(cls, db: Session, quiz_id: int) -> "AnswerKey":
+        """One query: every question of the quiz with its choices."""
+        rows = db.query(
+            models.Questions.id,
+            models.Questions.answer_type,
+            models.Choices.id,
+            models.Choices.is_correct,
+            models.Choices.normalized_text,
+            models.Choices.choice_text
+        ).outerjoin(
+            models.Choices, models.Choices.question_id == models.Questions.id
+        ).filter(models.Questions.quiz_id == quiz_id).all()
+        return cls(rows, quiz_id)
+
+    @classmethod
+    def from_snapshot(cls, snapshot_hash: str, content: bytes) -> "AnswerKey":
+        """Answer key of a published snapshot, kept per hash."""
+        key = _snapshot_keys.pop(snapshot_hash, None)
+        if key is None:
+            rows = []
+            quiz = json.loads(content)
+            for question in quiz["questions"]:
+                if not question["choices"]:
+                    rows.append((question["id"], question["answer_type"], None, None, None, None))
+                for choice in question["choices"]:
+                    rows.append((
+                        question["id"], question["answer_type"], choice["id"],
+                        choice["is_correct"], None, choice["choice_text"]
+                    ))
+            key = cls(rows, quiz["id"])
+        _snapshot_keys[snapshot_hash] = key
+        if len(_snapshot_keys) > SNAPSHOT_KEYS:
+            _snapshot_keys.popitem(last=False)
+        return key
+
+    @classmethod
+    def for_attempt(cls, db: Session, quiz_id: int, snapshot_hash: str | None) -> "AnswerKey | None":
+        """
+        Answer key of the version that was played: the snapshot if given, the
+        current quiz otherwise. None if the snapshot is not a version of this quiz.
+        """
+        if snapshot_hash is None:
+            return cls.load(db, quiz_id)
+        snapshot_hash = snapshot_hash.lower()
+        content = get_snapshot_content(db, snapshot_hash)
+        if content is None:
+            return None
+        key = cls.from_snapshot(snapshot_hash, content)
+        return key if key.quiz_id == quiz_id else None
+
+    def is_correct(self, answer, max_typos: int = 0) -> bool:
+        """Check one answer (question_id, choice_id, text). Unknown questions count as incorrect."""
+        answer_type = self.answer_types.get(answer.question_id)
+        if answer_type is None:
+            return False
+        if answer_type == "text":
+            return answer.text is not None and is_accepted(
+                normalize_answer(answer.text),
+                self.correct_texts.get(answer.question_id, frozenset()),
+                max_typos
+            )
+        return answer.choice_id in self.correct_choices.get(answer.question_id, frozenset())
+
+    def grade(self, answers: list[GradeAnswer], max_typos: int = 0) -> GradeResponse:
+        """Grade a whole attempt in one pass. Unknown questions count as incorrect."""
+        results = []
+        seen = set()
+        for answer in answers:
+            # Solo cuenta la primera respuesta de cada pregunta
+            if answer.question_id in seen:
+                continue
+            seen.add(answer.question_id)
+            results.append(GradeResult(
+                question_id=answer.question_id,
+                is_correct=self.is_correct(answer, max_typos)
+            ))
+
+        correct_answers = sum(result.is_correct for result in results)
+        return GradeResponse(
+            correct_answers=correct_answers,
+            total_questions=len(self.answer_types),
+            score=round(100 * correct_answers / len(self.answer_types)) if self.answer_types else 0,
+            results=results
+        )
+
@@ -0,0 +1,189 @@
+"""
+Streaming export and import of a user's quiz library as NDJSON
+(one QuizExport object per line).
+"""
+
+from typing import AsyncIterator, Iterator
+
+from pydantic import ValidationError
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+from database import session_local
+from grading import normalize_answer
+from schemas.quiz import QuizExport, QuestionBase, ChoiceBase
+import models
+
+# Filas leídas por viaje al servidor durante el export
+EXPORT_FETCH_SIZE = 1000
+
+# Preguntas acumuladas antes de escribir un bloque durante el import
+IMPORT_CHUNK_QUESTIONS = 1000
+
+# Tamaño máximo de una línea (un quiz) del import: acota lo que se acumula en memoria
+MAX_IMPORT_LINE_BYTES = 8 * 2**20
+
+
+class LibraryImportError(ValueError):
+    """Invalid line in an NDJSON import."""
+
+    def __init__(self, line_number: int, message: str):
+        super().__init__(f"Línea {line_number}: {message}")
+        self.line_number = line_number
+
+
+def export_quiz_lines(user_id: int) -> Iterator[str]:
+    """
+    Yield the user's quizzes as NDJSON lines.
+    A single ordered join is streamed with a server-side cursor, and only the
+    quiz being assembled is held in memory.
+    """
+    db = session_local()
+    try:
+        rows = db.query(
+            models.Quizzes.id.label("quiz_id"),
+            models.Quizzes.title,
+            models.Questions.id.label("question_id"),
+            models.Questions.question_text,
+            models.Questions.answer_type,
+            models.Choices.choice_text,
+            models.Choices.is_correct,
+        ).outerjoin(
+            models.Questions, models.Questions.quiz_id == models.Quizzes.id
+        ).outerjoin(
+            models.Choices, models.Choices.question_id == models.Questions.id
+        ).filter(
+            models.Quizzes.user_id == user_id
+        ).order_by(
+            models.Quizzes.id, models.Questions.position, models.Questions.id, models.Choices.id
+        ).execution_options(yield_per=EXPORT_FETCH_SIZE)
+
+        quiz_id = None
+        question_id = None
+        quiz = None
+        for row in rows:
+            if row.quiz_id != quiz_id:
+                if quiz is not None:
+                    yield quiz.model_dump_json() + "\n"
+                quiz_id = row.quiz_id
+                question_id = None
+                quiz = QuizExport(title=row.title, questions=[])
+
+            if row.question_id is None:
+                continue
+            if row.question_id != question_id:
+                question_id = row.question_id
+                quiz.questions.append(QuestionBase(
+                    question_text=row.question_text,
+                    answer_type=row.answer_type,
+                    choices=[]
+                ))
+            if row.choice_text is not None:
+                quiz.questions[-1].choices.append(
+                    ChoiceBase(choice_text=row.choice_text, is_correct=row.is_correct)
+                )
+
+        if quiz is not None:
+            yield quiz.model_dump_json() + "\n"
+    finally:
+        db.close()
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_line_bytes: int = MAX_IMPORT_LINE_BYTES) -> AsyncIterator[bytes]:
+    """
+    Split a byte stream into lines without reading it fully into memory.
+    Raises LibraryImportError as soon as a line grows past max_line_bytes.
+    """
+    too_long = f"línea demasiado larga (máximo {max_line_bytes} bytes)"
+    buffer = b""
+    line_number = 0
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            if len(line) > max_line_bytes:
+                raise LibraryImportError(line_number, too_long)
+            yield line
+        # Línea sin terminar: no se sigue acumulando más allá del límite
+        if len(buffer) > max_line_bytes:
+            raise LibraryImportError(line_number + 1, too_long)
+    if buffer:
+        yield buffer
+
+
+def write_quizzes(db: Session, user_id: int, quizzes: list[QuizExport]) -> tuple[list[int], int]:
+    """
+    Bulk insert a block of quizzes with their questions and choices.
+    Returns (quiz ids, questions inserted). Does not commit.
+    """
+    # Hora de la base de datos, la misma con la que se generan los tokens de /sync
+    now = db.scalar(select(func.now()))
+    quiz_ids = db.scalars(
+        insert(models.Quizzes).returning(models.Quizzes.id, sort_by_parameter_order=True),
+        [{"title": quiz.title, "user_id": user_id, "updated_at": now} for quiz in quizzes]
+    ).all()
+
+    questions = [
+        (quiz_id, ordinal, question)
+        for quiz_id, quiz in zip(quiz_ids, quizzes)
+        for ordinal, question in enumerate(quiz.questions)
+    ]
+    if not questions:
+        return quiz_ids, 0
+
+    question_ids = db.scalars(
+        insert(models.Questions).returning(models.Questions.id, sort_by_parameter_order=True),
+        [
+            {"question_text": q.question_text, "answer_type": q.answer_type, "quiz_id": quiz_id,
+             "ordinal": ordinal, "position": ordinal, "updated_at": now}
+            for quiz_id, ordinal, q in questions
+        ]
+    ).all()
+
+    choices = [
+        {"choice_text": c.choice_text, "is_correct": c.is_correct, "question_id": question_id,
+         "normalized_text": normalize_answer(c.choice_text), "updated_at": now}
+        for question_id, (_, _, q) in zip(question_ids, questions)
+        for c in q.choices
+    ]
+    if choices:
+        db.execute(insert(models.Choices), choices)
+
+    return quiz_ids, len(questions)
+
+
+async def import_quiz_lines(db: Session, user_id: int, lines: AsyncIterator[bytes]) -> tuple[int, int]:
+    """
+    Parse NDJSON lines and insert them in blocks of about IMPORT_CHUNK_QUESTIONS
+    questions. Nothing is committed here; the caller commits or rolls back.
+    Returns (quizzes, questions) imported.
+    """
+    total_quizzes = 0
+    total_questions = 0
+    pending: list[QuizExport] = []
+    pending_questions = 0
+
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            quiz = QuizExport.model_validate_json(line)
+        except ValidationError as e:
+            raise LibraryImportError(line_number, str(e.errors()[0]["msg"]))
+
+        pending.append(quiz)
+        pending_questions += len(quiz.questions)
+        if pending_questions >= IMPORT_CHUNK_QUESTIONS:
+            total_questions += write_quizzes(db, user_id, pending)[1]
+            total_quizzes += len(pending)
+            pending = []
+            pending_questions = 0
+
+    if pending:
+        total_questions += write_quizzes(db, user_id, pending)[1]
+        total_quizzes += len(pending)
+
+    return total_quizzes, total_questions
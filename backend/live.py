@@ -0,0 +1,216 @@
+"""
+Live multiplayer quiz rooms, keyed by share code and held in memory.
+
+The host (quiz owner) advances questions, players answer over WebSocket,
+answers are graded against the published snapshot and a coalesced
+leaderboard is broadcast to every connection at a fixed interval.
+Rooms live in a single worker, so a room's connections must reach the
+same worker (sticky routing when running several). Joining and leaving
+go through rooms_lock, so a room is never dropped while someone joins it.
+
+    python bench/live_load.py --players 1000
+"""
+
+import asyncio
+import heapq
+import json
+import os
+from array import array
+
+from fastapi import WebSocket, status
+
+from grading import normalize_answer
+
+# Intervalo mínimo entre difusiones del ranking
+LEADERBOARD_INTERVAL = float(os.getenv("LIVE_LEADERBOARD_INTERVAL", "0.5"))
+LEADERBOARD_SIZE = 10
+
+# Un cliente lento no puede retrasar la difusión más de este tiempo
+SEND_TIMEOUT = float(os.getenv("LIVE_SEND_TIMEOUT", "2"))
+
+
+class Room:
+    """State of one live quiz. Per-player data lives in parallel arrays indexed by slot."""
+
+    def __init__(self, share_code: str, host_id: int, quiz: dict):
+        self.share_code = share_code
+        self.host_id = host_id
+        self.title = quiz["title"]
+
+        # Mensajes de pregunta serializados una sola vez, sin las respuestas correctas
+        self.question_messages: list[str] = []
+        self.correct_choices: list[frozenset[int]] = []
+        self.correct_texts: list[frozenset[str]] = []
+        for index, question in enumerate(quiz["questions"]):
+            self.question_messages.append(json.dumps({
+                "type": "question",
+                "index": index,
+                "total": len(quiz["questions"]),
+                "question": {
+                    "id": question["id"],
+                    "question_text": question["question_text"],
+                    "answer_type": question["answer_type"],
+                    "choices": [
+                        {"id": c["id"], "choice_text": c["choice_text"]}
+                        for c in question["choices"]
+                    ] if question["answer_type"] != "text" else [],
+                },
+            }))
+            correct = [c for c in question["choices"] if c["is_correct"]]
+            self.correct_choices.append(frozenset(c["id"] for c in correct))
+            self.correct_texts.append(frozenset(normalize_answer(c["choice_text"]) for c in correct))
+
+        self.current = -1
+        self.slots: dict[int, int] = {}  # user_id -> slot
+        self.names: list[str] = []
+        self.scores = array("i")
+        self.answered_round = array("i")  # Última pregunta respondida por slot
+        self.sockets: dict[int, WebSocket] = {}  # slot -> socket conectado
+        self.host_socket: WebSocket | None = None
+
+        self.dirty = False
+        self.closed = False
+        self._flusher: asyncio.Task | None = None
+
+    # ---------- membership ----------
+
+    def join(self, user_id: int, name: str, websocket: WebSocket) -> int | None:
+        """Register a connection. Returns the player slot, or None for the host."""
+        if user_id == self.host_id:
+            self.host_socket = websocket
+            return None
+        slot = self.slots.get(user_id)
+        if slot is None:
+            slot = len(self.names)
+            self.slots[user_id] = slot
+            self.names.append(name)
+            self.scores.append(0)
+            self.answered_round.append(-1)
+        self.sockets[slot] = websocket
+        self.dirty = True
+        return slot
+
+    def leave(self, slot: int | None, websocket: WebSocket):
+        if slot is None:
+            if self.host_socket is websocket:
+                self.host_socket = None
+        elif self.sockets.get(slot) is websocket:
+            del self.sockets[slot]
+            self.dirty = True
+
+    @property
+    def empty(self) -> bool:
+        return self.host_socket is None and not self.sockets
+
+    # ---------- game ----------
+
+    def answer(self, slot: int, choice_id: int | None, text: str | None) -> bool | None:
+        """Grade an answer for the current question. None if it cannot be accepted."""
+        if self.closed or self.current < 0 or self.answered_round[slot] == self.current:
+            return None
+        self.answered_round[slot] = self.current
+
+        if isinstance(text, str):
+            correct = normalize_answer(text) in self.correct_texts[self.current]
+        else:
+            correct = choice_id in self.correct_choices[self.current]
+        if correct:
+            self.scores[slot] += 1
+            self.dirty = True
+        return correct
+
+    def leaderboard(self) -> list[dict]:
+        top = heapq.nlargest(LEADERBOARD_SIZE, range(len(self.scores)), key=self.scores.__getitem__)
+        return [{"name": self.names[slot], "score": self.scores[slot]} for slot in top]
+
+    def leaderboard_message(self, message_type: str = "leaderboard") -> str:
+        return json.dumps({
+            "type": message_type,
+            "players": len(self.sockets),
+            "top": self.leaderboard(),
+        })
+
+    # ---------- broadcasting ----------
+
+    async def broadcast(self, message: str):
+        """Send one pre-serialized message to every connection concurrently; drop failed or slow ones."""
+        targets = list(self.sockets.items())
+        if self.host_socket is not None:
+            targets.append((None, self.host_socket))
+        results = await asyncio.gather(
+            *(asyncio.wait_for(websocket.send_text(message), SEND_TIMEOUT) for _, websocket in targets),
+            return_exceptions=True
+        )
+        dropped = []
+        for (slot, websocket), result in zip(targets, results):
+            if isinstance(result, Exception):
+                self.leave(slot, websocket)
+                dropped.append(websocket)
+        if dropped:
+            # 1013 (try again later): el cliente puede reconectarse y recuperar su puesto
+            await asyncio.gather(*(self._close(websocket) for websocket in dropped))
+
+    @staticmethod
+    async def _close(websocket: WebSocket):
+        try:
+            await asyncio.wait_for(websocket.close(code=status.WS_1013_TRY_AGAIN_LATER), SEND_TIMEOUT)
+        except Exception:
+            pass
+
+    async def advance(self):
+        """Move to the next question, or finish the quiz after the last one."""
+        if self.closed:
+            return
+        self.current += 1
+        if self.current >= len(self.question_messages):
+            await self.finish()
+            return
+        await self.broadcast(self.question_messages[self.current])
+
+    async def finish(self):
+        self.closed = True
+        await self.broadcast(self.leaderboard_message("ended"))
+
+    def start_flusher(self):
+        self._flusher = asyncio.create_task(self._flush_leaderboard())
+
+    async def _flush_leaderboard(self):
+        # Agrupa todos los cambios del intervalo en una sola difusión
+        while not self.closed:
+            await asyncio.sleep(LEADERBOARD_INTERVAL)
+            if self.dirty:
+                self.dirty = False
+                await self.broadcast(self.leaderboard_message())
+
+    def stop(self):
+        self.closed = True
+        if self._flusher is not None:
+            self._flusher.cancel()
+
+
+# Salas activas en este worker: share_code -> Room
+rooms: dict[str, Room] = {}
+rooms_lock = asyncio.Lock()
+
+
+async def join_room(
+    share_code: str, host_id: int, quiz_content: bytes, user_id: int, name: str, websocket: WebSocket
+) -> tuple[Room, int | None]:
+    """Join the room of a share code, creating it from the snapshot content if needed."""
+    async with rooms_lock:
+        room = rooms.get(share_code)
+        if room is None or room.closed:
+            room = Room(share_code, host_id, json.loads(quiz_content))
+            rooms[share_code] = room
+            room.start_flusher()
+        return room, room.join(user_id, name, websocket)
+
+
+async def leave_room(room: Room, slot: int | None, websocket: WebSocket):
+    """Leave the room and drop it once nobody is connected."""
+    async with rooms_lock:
+        room.leave(slot, websocket)
+        if room.empty:
+            room.stop()
+            if rooms.get(room.share_code) is room:
+                del rooms[room.share_code]
@@ -1,13 +1,44 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 
 import models
+import cache
+import partitions
+from replica import replica_router, WRITE_MARKER_HEADER
+import share_codes
+import sync as library_sync
+import trending
+from auth import current_user_dependency
 from database import engine
-from routers import auth, quizzes, questions, share, history
+from routers import auth, quizzes, questions, share, history, sync
 from migrations import init_migrations
 
-app = FastAPI(title="Quiz App API", version="1.0.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Escuchar invalidaciones de caché de los demás workers
+    stop_listener = cache.start_listener()
+    # Particiones futuras de quiz_history y retención opcional
+    maintenance = asyncio.create_task(partitions.maintain_partitions())
+    # Códigos de compartir activos, para rechazar códigos desconocidos sin consultar la base de datos
+    share_filter_refresh = asyncio.create_task(share_codes.refresh_periodically())
+    # Ranking de quizzes públicos en memoria para /share/trending
+    trending_refresh = asyncio.create_task(trending.refresh_periodically())
+    # Retención de las lápidas de la sincronización incremental
+    tombstone_pruning = asyncio.create_task(library_sync.prune_periodically())
+    yield
+    tombstone_pruning.cancel()
+    trending_refresh.cancel()
+    share_filter_refresh.cancel()
+    maintenance.cancel()
+    if stop_listener:
+        stop_listener.set()
+
+
+app = FastAPI(title="Quiz App API", version="1.0.0", lifespan=lifespan)
 
 # Configurar CORS para permitir peticiones desde el frontend
 app.add_middleware(
@@ -16,6 +47,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Los clientes reenvían la marca de escritura en las lecturas siguientes
+    expose_headers=[WRITE_MARKER_HEADER],
 )
 
 # Crear tablas
@@ -30,6 +63,7 @@ app.include_router(quizzes.router)
 app.include_router(questions.router)
 app.include_router(share.router)
 app.include_router(history.router)
+app.include_router(sync.router)
 
 
 @app.get("/")
@@ -37,6 +71,24 @@ async def root():
     return {"message": "Quiz App API", "version": "1.0.0"}
 
 
+@app.get("/metrics/cache")
+async def cache_metrics(current_user: current_user_dependency):
+    """Métricas de la caché de respuestas (requiere sesión)"""
+    return cache.metrics()
+
+
+@app.get("/metrics/replica")
+async def replica_metrics(current_user: current_user_dependency):
+    """Métricas del enrutado a la réplica de lectura (requiere sesión)"""
+    return replica_router.metrics()
+
+
+@app.get("/metrics/share-codes")
+async def share_code_metrics(current_user: current_user_dependency):
+    """Métricas del filtro de códigos de compartir (requiere sesión)"""
+    return share_codes.share_code_filter.metrics()
+
+
 if __name__ == "__main__":
     # Ejecutar en 0.0.0.0 para aceptar conexiones de cualquier IP (red local)
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
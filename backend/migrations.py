@@ -4,7 +4,73 @@ Handles automatic column additions and schema modifications.
 """
 
 from sqlalchemy import text, inspect
-from database import engine
+from database import engine, advisory_lock
+from partitions import ensure_history_partitions
+from grading import normalize_answer
+
+
+# Columnas añadidas después de la creación inicial de las tablas: (tabla, columna, tipo SQL)
+ADDED_COLUMNS = [
+    ("questions", "answer_type", "VARCHAR DEFAULT 'options'"),
+    ("quizzes", "snapshot_hash", "VARCHAR(64)"),
+    ("quiz_history", "snapshot_hash", "VARCHAR(64)"),
+    ("questions", "ordinal", "INTEGER"),
+    ("questions", "position", "INTEGER"),
+    ("quizzes", "updated_at", "TIMESTAMP WITH TIME ZONE"),
+    ("questions", "updated_at", "TIMESTAMP WITH TIME ZONE"),
+    ("choices", "updated_at", "TIMESTAMP WITH TIME ZONE"),
+    ("choices", "normalized_text", "VARCHAR"),
+]
+
+# Claves foráneas añadidas a tablas ya creadas (solo Postgres; SQLite no admite ADD CONSTRAINT):
+# (tabla, columna, tabla referida, ON DELETE)
+ADDED_FOREIGN_KEYS = [
+    ("quiz_trending", "quiz_id", "quizzes", "CASCADE"),
+]
+
+# Filas por lote al rellenar columnas calculadas en Python
+BACKFILL_BATCH_SIZE = 5000
+
+
+def backfill_normalized_answers(conn):
+    last_id = 0
+    while True:
+        rows = conn.execute(text(
+            "SELECT id, choice_text FROM choices WHERE id > :last_id ORDER BY id LIMIT :batch"
+        ), {"last_id": last_id, "batch": BACKFILL_BATCH_SIZE}).all()
+        if not rows:
+            return
+        conn.execute(text("UPDATE choices SET normalized_text = :normalized WHERE id = :id"), [
+            {"id": row.id, "normalized": normalize_answer(row.choice_text or "")} for row in rows
+        ])
+        last_id = rows[-1].id
+
+
+# Relleno de filas existentes tras añadir una columna: (tabla, columna) -> SQL o función
+COLUMN_BACKFILLS = {
+    # Ordinal denso 0..n-1 por quiz, en orden de creación
+    ("questions", "ordinal"): """
+        UPDATE questions SET ordinal = ranked.rn - 1
+        FROM (
+            SELECT id, row_number() OVER (PARTITION BY quiz_id ORDER BY id) AS rn FROM questions
+        ) AS ranked
+        WHERE questions.id = ranked.id
+    """,
+    # Orden visible inicial: el de creación
+    ("questions", "position"): """
+        UPDATE questions SET position = ranked.rn - 1
+        FROM (
+            SELECT id, row_number() OVER (PARTITION BY quiz_id ORDER BY id) AS rn FROM questions
+        ) AS ranked
+        WHERE questions.id = ranked.id
+    """,
+    # SQLite no admite un DEFAULT no constante en ADD COLUMN: se rellena aquí
+    ("quizzes", "updated_at"): "UPDATE quizzes SET updated_at = created_at",
+    ("questions", "updated_at"): "UPDATE questions SET updated_at = CURRENT_TIMESTAMP",
+    ("choices", "updated_at"): "UPDATE choices SET updated_at = CURRENT_TIMESTAMP",
+    # La normalización (acentos, Unicode) se hace en Python
+    ("choices", "normalized_text"): backfill_normalized_answers,
+}
 
 
 def run_migrations():
@@ -20,18 +86,190 @@ def run_migrations():
             print("[Migration] Waiting for tables to be created...")
             return
 
-        # Check if answer_type column exists in questions table
-        columns = [col['name'] for col in inspector.get_columns('questions')]
+        # Add any column from ADDED_COLUMNS that the table does not have yet
+        added = False
+        for table, column, ddl in ADDED_COLUMNS:
+            columns = [col['name'] for col in inspector.get_columns(table)]
+            if column in columns:
+                continue
+            print(f"[Migration] Adding '{column}' column to '{table}' table...")
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+            backfill = COLUMN_BACKFILLS.get((table, column))
+            if callable(backfill):
+                backfill(conn)
+            elif backfill:
+                conn.execute(text(backfill))
+            conn.commit()
+            print(f"[Migration] Column '{column}' added successfully")
+            added = True
+
+        if not added:
+            print("[Migration] Database schema is up to date")
+
+        add_foreign_keys(conn, inspector)
+        create_search_indexes(conn)
+
+
+def add_foreign_keys(conn, inspector):
+    """Add the foreign keys of ADDED_FOREIGN_KEYS, dropping orphan rows first."""
+    if conn.dialect.name != "postgresql":
+        return
+    tables = set(inspector.get_table_names())
+    for table, column, referred, ondelete in ADDED_FOREIGN_KEYS:
+        if table not in tables:
+            continue
+        if any(fk["constrained_columns"] == [column] for fk in inspector.get_foreign_keys(table)):
+            continue
+        print(f"[Migration] Adding foreign key '{table}.{column}' -> '{referred}'...")
+        conn.execute(text(
+            f"DELETE FROM {table} WHERE {column} IS NOT NULL "
+            f"AND NOT EXISTS (SELECT 1 FROM {referred} r WHERE r.id = {table}.{column})"
+        ))
+        conn.execute(text(
+            f"ALTER TABLE {table} ADD CONSTRAINT {table}_{column}_fkey "
+            f"FOREIGN KEY ({column}) REFERENCES {referred} (id) ON DELETE {ondelete}"
+        ))
+        conn.commit()
+
+
+# Columnas de texto indexadas para la búsqueda (tabla, columna)
+SEARCH_COLUMNS = [
+    ("quizzes", "title"),
+    ("questions", "question_text"),
+    ("choices", "choice_text"),
+]
+
 
-        if 'answer_type' not in columns:
-            print("[Migration] Adding 'answer_type' column to 'questions' table...")
+def create_search_indexes(conn):
+    """
+    Create the full-text search indexes used by GET /quizzes/search.
+    Postgres: GIN indexes over tsvector and trigram expressions.
+    SQLite: FTS5 external-content tables kept in sync with triggers.
+    """
+    dialect = conn.dialect.name
+
+    if dialect == "postgresql":
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        for table, column in SEARCH_COLUMNS:
             conn.execute(text(
-                "ALTER TABLE questions ADD COLUMN answer_type VARCHAR DEFAULT 'options'"
+                f"CREATE INDEX IF NOT EXISTS ix_{table}_{column}_fts ON {table} "
+                f"USING GIN (to_tsvector('simple', coalesce({column}, '')))"
+            ))
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_{table}_{column}_trgm ON {table} "
+                f"USING GIN ({column} gin_trgm_ops)"
+            ))
+        conn.commit()
+
+    elif dialect == "sqlite":
+        existing = {row[0] for row in conn.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'table'"
+        ))}
+        for table, column in SEARCH_COLUMNS:
+            fts = f"{table}_fts"
+            if fts in existing:
+                continue
+            print(f"[Migration] Creating FTS5 index '{fts}'...")
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE {fts} USING fts5({column}, content='{table}', "
+                f"content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN "
+                f"INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column}); END"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column}); END"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER {fts}_au AFTER UPDATE OF {column} ON {table} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column}); "
+                f"INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column}); END"
+            ))
+            # Indexar las filas que ya existían
+            conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+        conn.commit()
+
+
+# Índices esperados según las consultas de routers/: nombre -> (tabla, columnas)
+INDEXES = {
+    "ix_quizzes_user_id_updated_at": ("quizzes", ["user_id", "updated_at"]),
+    "ix_questions_quiz_id_ordinal": ("questions", ["quiz_id", "ordinal"]),
+    "ix_questions_quiz_id_position": ("questions", ["quiz_id", "position", "id"]),
+    "ix_questions_quiz_id_updated_at": ("questions", ["quiz_id", "updated_at"]),
+    "ix_choices_question_id_updated_at": ("choices", ["question_id", "updated_at"]),
+    "ix_quiz_history_user_id_completed_at": ("quiz_history", ["user_id", "completed_at"]),
+    "ix_quiz_history_quiz_id": ("quiz_history", ["quiz_id"]),
+    "ix_deleted_entities_user_id_deleted_at": ("deleted_entities", ["user_id", "deleted_at"]),
+    "ix_deleted_entities_deleted_at": ("deleted_entities", ["deleted_at"]),
+}
+
+UNIQUE_INDEXES = {"ix_questions_quiz_id_ordinal"}
+
+# Índices obsoletos: duplican la clave primaria o son B-tree sobre texto libre
+OBSOLETE_INDEXES = [
+    "ix_users_id",
+    "ix_quizzes_id",
+    "ix_questions_id",
+    "ix_choices_id",
+    "ix_quiz_history_id",
+    "ix_quizzes_title",
+    "ix_questions_question_text",
+    "ix_choices_choice_text",
+    "ix_quiz_history_user_id",
+    "ix_questions_quiz_id",
+    "ix_quizzes_user_id",
+    "ix_choices_question_id",
+]
+
+
+def sync_indexes():
+    """
+    Bring indexes of existing databases in line with models.py.
+    On Postgres indexes are built and dropped CONCURRENTLY (outside a
+    transaction) so writes are not blocked while they run. Workers starting
+    together take turns on an advisory lock; the later ones find the indexes
+    already built.
+    """
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn, \
+            advisory_lock(conn, "sync_indexes"):
+        is_postgres = conn.dialect.name == "postgresql"
+        concurrently = "CONCURRENTLY " if is_postgres else ""
+
+        # Un CREATE INDEX CONCURRENTLY interrumpido deja el índice marcado como inválido.
+        # Uno que se está construyendo también figura como inválido: esos no se tocan.
+        invalid = set()
+        # Las tablas particionadas no admiten CONCURRENTLY (sus índices se crean en cada partición)
+        partitioned = set()
+        if is_postgres:
+            invalid = {row[0] for row in conn.execute(text(
+                "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE NOT i.indisvalid AND i.indexrelid NOT IN ("
+                "    SELECT index_relid FROM pg_stat_progress_create_index WHERE index_relid <> 0"
+                ")"
+            ))}
+            partitioned = {row[0] for row in conn.execute(text(
+                "SELECT relname FROM pg_class WHERE relkind = 'p'"
+            ))}
+
+        for name in OBSOLETE_INDEXES + sorted(invalid & INDEXES.keys()):
+            conn.execute(text(f"DROP INDEX {concurrently}IF EXISTS {name}"))
+
+        inspector = inspect(conn)
+        tables = set(inspector.get_table_names())
+        for name, (table, columns) in INDEXES.items():
+            if table not in tables:
+                continue
+            existing = {index["name"] for index in inspector.get_indexes(table)}
+            if name in existing and name not in invalid:
+                continue
+            print(f"[Migration] Creating index '{name}'...")
+            unique = "UNIQUE " if name in UNIQUE_INDEXES else ""
+            mode = "" if table in partitioned else concurrently
+            conn.execute(text(
+                f"CREATE {unique}INDEX {mode}IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"
             ))
-            conn.commit()
-            print("[Migration] Column 'answer_type' added successfully")
-        else:
-            print("[Migration] Database schema is up to date")
 
 
 def init_migrations():
@@ -41,5 +279,7 @@ def init_migrations():
     """
     try:
         run_migrations()
+        sync_indexes()
+        ensure_history_partitions()
     except Exception as e:
         print(f"[Migration] Warning: {e}")
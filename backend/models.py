@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime
+from sqlalchemy import Boolean, Column, Float, ForeignKey, Index, Integer, String, DateTime, LargeBinary
 from sqlalchemy.sql import func
 from database import Base
 
@@ -6,7 +6,7 @@ from database import Base
 class Users(Base):
     __tablename__ = 'users'
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     email = Column(String, unique=True, index=True)
     hashed_password = Column(String)
     name = Column(String)
@@ -15,39 +15,65 @@ class Users(Base):
 
 class Quizzes(Base):
     __tablename__ = 'quizzes'
+    __table_args__ = (
+        # Quizzes del usuario y cambios desde una fecha (ver sync.py)
+        Index("ix_quizzes_user_id_updated_at", "user_id", "updated_at"),
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
-    title = Column(String, index=True)
+    id = Column(Integer, primary_key=True)
+    title = Column(String)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), default=func.now(), server_default=func.now(), onupdate=func.now())
     user_id = Column(Integer, ForeignKey("users.id"))
     share_code = Column(String(8), unique=True, nullable=True, index=True)
     is_public = Column(Boolean, default=False)
+    snapshot_hash = Column(String(64), nullable=True)  # Última versión publicada (ver QuizSnapshots)
 
 
 class Questions(Base):
     __tablename__ = 'questions'
-
-    id = Column(Integer, primary_key=True, index=True)
-    question_text = Column(String, index=True)
+    __table_args__ = (
+        # Muestreo aleatorio por ordinal (ver sampling.py)
+        Index("ix_questions_quiz_id_ordinal", "quiz_id", "ordinal", unique=True),
+        # Orden visible y paginación por cursor
+        Index("ix_questions_quiz_id_position", "quiz_id", "position", "id"),
+        Index("ix_questions_quiz_id_updated_at", "quiz_id", "updated_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    question_text = Column(String)
     answer_type = Column(String, default="options")  # "text" o "options"
     quiz_id = Column(Integer, ForeignKey("quizzes.id"))
+    ordinal = Column(Integer)  # Posición densa 0..n-1 dentro del quiz
+    position = Column(Integer)  # Orden de la pregunta en el quiz (puede tener huecos)
+    updated_at = Column(DateTime(timezone=True), default=func.now(), server_default=func.now(), onupdate=func.now())
 
 
 class Choices(Base):
     __tablename__ = "choices"
+    __table_args__ = (
+        Index("ix_choices_question_id_updated_at", "question_id", "updated_at"),
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
-    choice_text = Column(String, index=True)
+    id = Column(Integer, primary_key=True)
+    choice_text = Column(String)
     is_correct = Column(Boolean, default=False)
     question_id = Column(Integer, ForeignKey("questions.id"))
+    normalized_text = Column(String)  # choice_text normalizado para corregir respuestas de texto (ver grading.py)
+    updated_at = Column(DateTime(timezone=True), default=func.now(), server_default=func.now(), onupdate=func.now())
 
 
 class QuizHistory(Base):
+    # En Postgres, particionada por mes de completed_at (ver partitions.py)
     __tablename__ = "quiz_history"
+    __table_args__ = (
+        # Historial del usuario ordenado por fecha (get_my_history, get_my_stats)
+        Index("ix_quiz_history_user_id_completed_at", "user_id", "completed_at"),
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), index=True)
-    quiz_id = Column(Integer, ForeignKey("quizzes.id"), nullable=True)  # Puede ser null si el quiz fue eliminado
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    quiz_id = Column(Integer, ForeignKey("quizzes.id", ondelete="SET NULL"), nullable=True, index=True)  # Puede ser null si el quiz fue eliminado
     quiz_title = Column(String)  # Guardamos el título para mantenerlo aunque se elimine el quiz
     score = Column(Integer)  # Porcentaje 0-100
     correct_answers = Column(Integer)
@@ -56,6 +82,47 @@ class QuizHistory(Base):
     is_external = Column(Boolean, default=False)  # True si vino de un código compartido
     owner_name = Column(String, nullable=True)  # Nombre del dueño si es externo
     completed_at = Column(DateTime(timezone=True), server_default=func.now())
+    snapshot_hash = Column(String(64), nullable=True)  # Versión exacta del quiz jugada, si se conoce
+
+
+class QuizSnapshots(Base):
+    __tablename__ = "quiz_snapshots"
+
+    # Árbol del quiz congelado al publicarlo; inmutable e identificado por su sha256
+    hash = Column(String(64), primary_key=True)
+    quiz_id = Column(Integer, index=True)  # Sin FK: el snapshot sobrevive al quiz
+    content = Column(LargeBinary)  # JSON de QuizResponse en UTF-8
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class QuizAttemptAnswers(Base):
+    __tablename__ = "quiz_attempt_answers"
+
+    # Una fila por intento: las respuestas van empaquetadas en arrays binarios (ver analytics.py)
+    history_id = Column(Integer, primary_key=True)  # Sin FK: quiz_history está particionada en Postgres
+    quiz_id = Column(Integer, index=True)  # Sin FK para no bloquear el borrado del quiz
+    question_ids = Column(LargeBinary)  # int32 little-endian, una entrada por respuesta
+    choice_ids = Column(LargeBinary)  # int32 little-endian, 0 = sin opción elegida
+    correct_flags = Column(LargeBinary)  # uint8, 1 = respuesta correcta
+
+
+class DeletedEntities(Base):
+    __tablename__ = "deleted_entities"
+    __table_args__ = (
+        Index("ix_deleted_entities_user_id_deleted_at", "user_id", "deleted_at"),
+    )
+
+    # Lápidas de los borrados para la sincronización incremental (ver sync.py)
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer)  # Dueño del quiz afectado
+    entity = Column(String(16))  # "quiz", "question" o "choice"
+    entity_id = Column(Integer)
+    deleted_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)  # Para la retención
 
 
+class QuizTrending(Base):
+    __tablename__ = "quiz_trending"
 
+    # Contador de intentos recientes con decaimiento temporal (ver trending.py)
+    quiz_id = Column(Integer, ForeignKey("quizzes.id", ondelete="CASCADE"), primary_key=True)
+    score = Column(Float, index=True)  # log de la suma de pesos, comparable entre quizzes sin reescalar
@@ -0,0 +1,73 @@
+"""
+Keyset pagination of a quiz's questions by (position, id).
+The cursor is the (position, id) of the last question returned, encoded
+as an opaque string, so each page is a single index range scan.
+"""
+
+import base64
+
+from fastapi import HTTPException, status
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import Session
+
+from schemas.quiz import QuestionPage, QuestionResponse, ChoiceResponse
+import models
+
+MAX_PAGE_SIZE = 200
+
+
+def next_position(db: Session, quiz_id: int) -> int:
+    """Position for a new question appended at the end of the quiz."""
+    last = db.query(func.max(models.Questions.position)).filter(
+        models.Questions.quiz_id == quiz_id
+    ).scalar()
+    return 0 if last is None else last + 1
+
+
+def encode_cursor(position: int, question_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{position}:{question_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[int, int]:
+    try:
+        position, question_id = base64.urlsafe_b64decode(cursor.encode()).decode().split(":")
+        return int(position), int(question_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def question_page(db: Session, quiz_id: int, cursor: str | None, limit: int) -> QuestionPage:
+    """Return up to `limit` questions after the cursor, with their choices."""
+    query = db.query(models.Questions).filter(models.Questions.quiz_id == quiz_id)
+    if cursor:
+        query = query.filter(
+            tuple_(models.Questions.position, models.Questions.id) > tuple_(*decode_cursor(cursor))
+        )
+    # Se pide una fila de más para saber si hay otra página
+    questions = query.order_by(models.Questions.position, models.Questions.id).limit(limit + 1).all()
+    has_more = len(questions) > limit
+    questions = questions[:limit]
+
+    choices_by_question: dict[int, list[ChoiceResponse]] = {q.id: [] for q in questions}
+    if questions:
+        choices = db.query(models.Choices).filter(
+            models.Choices.question_id.in_(choices_by_question.keys())
+        ).order_by(models.Choices.id).all()
+        for c in choices:
+            choices_by_question[c.question_id].append(ChoiceResponse(
+                id=c.id,
+                choice_text=c.choice_text,
+                is_correct=c.is_correct,
+                question_id=c.question_id
+            ))
+
+    return QuestionPage(
+        questions=[QuestionResponse(
+            id=q.id,
+            question_text=q.question_text,
+            answer_type=q.answer_type,
+            quiz_id=q.quiz_id,
+            choices=choices_by_question[q.id]
+        ) for q in questions],
+        next_cursor=encode_cursor(questions[-1].position, questions[-1].id) if has_more else None
+    )
@@ -0,0 +1,260 @@
+"""
+Monthly range partitioning of quiz_history on completed_at (Postgres).
+
+An existing table is converted once with the convert command (not at
+startup: it locks quiz_history while it runs). The table is renamed to
+quiz_history_legacy and attached as the partition holding every row up
+to the end of its last month, so no rows are copied. Each later month
+gets its own partition, created ahead of time at startup and by a daily
+task. Retention drops whole partitions; SQLite has no partitioning, so
+there it deletes old rows in small batches instead.
+
+    python partitions.py convert
+    python partitions.py ensure
+    python partitions.py prune --keep-months 24
+"""
+
+import argparse
+import asyncio
+import os
+import re
+from datetime import datetime, timezone
+
+from sqlalchemy import delete, inspect, select, text
+
+from database import engine, advisory_lock
+import models
+
+# Meses futuros con partición ya creada
+HISTORY_PARTITIONS_AHEAD = int(os.getenv("HISTORY_PARTITIONS_AHEAD", "3"))
+
+# Retención automática en la tarea diaria; sin definir solo se ejecuta a mano
+HISTORY_RETENTION_MONTHS = os.getenv("HISTORY_RETENTION_MONTHS")
+
+MAINTENANCE_INTERVAL = float(os.getenv("HISTORY_MAINTENANCE_SECONDS", str(24 * 3600)))
+
+# Filas borradas por transacción en los borrados por lotes
+DELETE_BATCH_SIZE = 5000
+
+_BOUND = re.compile(r"FROM \((.+?)\) TO \((.+?)\)")
+
+
+def _month_start(moment: datetime) -> datetime:
+    return moment.astimezone(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def _parse_bound(value: str) -> datetime:
+    if value == "MINVALUE":
+        return datetime.min.replace(tzinfo=timezone.utc)
+    if value == "MAXVALUE":
+        return datetime.max.replace(tzinfo=timezone.utc)
+    return datetime.fromisoformat(value.strip("'"))
+
+
+def is_partitioned(conn) -> bool:
+    return conn.dialect.name == "postgresql" and conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_class WHERE relname = 'quiz_history' AND relkind = 'p')"
+    )).scalar()
+
+
+def list_partitions(conn) -> list[tuple[str, datetime, datetime]]:
+    """Partitions of quiz_history as (name, from, to), ordered by range."""
+    # Los límites se muestran en la zona horaria de la sesión
+    conn.execute(text("SET LOCAL TIME ZONE 'UTC'"))
+    rows = conn.execute(text("""
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'quiz_history'::regclass
+    """)).all()
+    partitions = []
+    for name, bound in rows:
+        match = _BOUND.search(bound)
+        if match:
+            partitions.append((name, _parse_bound(match.group(1)), _parse_bound(match.group(2))))
+    return sorted(partitions, key=lambda p: p[1])
+
+
+def partition_quiz_history(conn):
+    """
+    Convert a plain quiz_history table into a partitioned one (Postgres only),
+    in a single transaction. The old rows stay in place as the
+    quiz_history_legacy partition; its new primary key index is built and
+    the foreign keys re-created on the parent are validated against it.
+    """
+    if conn.dialect.name != "postgresql" or is_partitioned(conn):
+        return
+    inspector = inspect(conn)
+    if "quiz_history" not in inspector.get_table_names():
+        return
+    print("[Partitions] Partitioning 'quiz_history' by month...")
+
+    # La clave de partición no admite nulos
+    conn.execute(text("UPDATE quiz_history SET completed_at = now() WHERE completed_at IS NULL"))
+    last = conn.execute(text("SELECT max(completed_at) FROM quiz_history")).scalar()
+
+    # Una FK solo puede apuntar a una clave única que incluya completed_at
+    for fk in inspector.get_foreign_keys("quiz_attempt_answers"):
+        if fk["referred_table"] == "quiz_history":
+            conn.execute(text(f"ALTER TABLE quiz_attempt_answers DROP CONSTRAINT {fk['name']}"))
+    pk_name = inspector.get_pk_constraint("quiz_history")["name"]
+    if pk_name:
+        conn.execute(text(f"ALTER TABLE quiz_history DROP CONSTRAINT {pk_name}"))
+    # Se vuelven a crear en la tabla padre y se heredan al adjuntar
+    for fk in inspector.get_foreign_keys("quiz_history"):
+        conn.execute(text(f"ALTER TABLE quiz_history DROP CONSTRAINT {fk['name']}"))
+
+    conn.execute(text("ALTER TABLE quiz_history RENAME TO quiz_history_legacy"))
+    for index in ("ix_quiz_history_user_id_completed_at", "ix_quiz_history_quiz_id"):
+        conn.execute(text(f"ALTER INDEX IF EXISTS {index} RENAME TO {index.replace('quiz_history', 'quiz_history_legacy')}"))
+    conn.execute(text("ALTER TABLE quiz_history_legacy ALTER COLUMN completed_at SET NOT NULL"))
+
+    conn.execute(text(
+        "CREATE TABLE quiz_history (LIKE quiz_history_legacy INCLUDING DEFAULTS) "
+        "PARTITION BY RANGE (completed_at)"
+    ))
+    conn.execute(text("ALTER TABLE quiz_history ADD PRIMARY KEY (id, completed_at)"))
+    # LIKE no copia las claves foráneas
+    conn.execute(text(
+        "ALTER TABLE quiz_history ADD CONSTRAINT quiz_history_user_id_fkey "
+        "FOREIGN KEY (user_id) REFERENCES users (id)"
+    ))
+    conn.execute(text(
+        "ALTER TABLE quiz_history ADD CONSTRAINT quiz_history_quiz_id_fkey "
+        "FOREIGN KEY (quiz_id) REFERENCES quizzes (id) ON DELETE SET NULL"
+    ))
+    sequence = conn.execute(text("SELECT pg_get_serial_sequence('quiz_history_legacy', 'id')")).scalar()
+    if sequence:
+        conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY quiz_history.id"))
+    # Creados antes de adjuntar: se reutilizan los índices equivalentes de la tabla antigua
+    conn.execute(text("CREATE INDEX ix_quiz_history_user_id_completed_at ON quiz_history (user_id, completed_at)"))
+    conn.execute(text("CREATE INDEX ix_quiz_history_quiz_id ON quiz_history (quiz_id)"))
+
+    if last is None:
+        conn.execute(text("DROP TABLE quiz_history_legacy"))
+    else:
+        upper = _add_months(_month_start(last), 1)
+        conn.execute(text(
+            f"ALTER TABLE quiz_history ATTACH PARTITION quiz_history_legacy "
+            f"FOR VALUES FROM (MINVALUE) TO ('{upper.isoformat()}')"
+        ))
+    conn.commit()
+    print("[Partitions] 'quiz_history' is now partitioned")
+
+
+def convert_quiz_history():
+    """One-off conversion, serialized across processes with an advisory lock."""
+    with engine.connect() as conn, advisory_lock(conn, "partition_quiz_history"):
+        partition_quiz_history(conn)
+
+
+def ensure_history_partitions(months_ahead: int = HISTORY_PARTITIONS_AHEAD) -> list[str]:
+    """Create the partitions for the current month and the next `months_ahead`."""
+    created = []
+    # Los workers arrancan a la vez: uno crea las particiones y los demás las encuentran hechas
+    with engine.connect() as conn, advisory_lock(conn, "history_partitions"):
+        if not is_partitioned(conn):
+            return created
+        ranges = [(start, end) for _, start, end in list_partitions(conn)]
+        month = _month_start(datetime.now(timezone.utc))
+        for _ in range(months_ahead + 1):
+            following = _add_months(month, 1)
+            if not any(start < following and month < end for start, end in ranges):
+                name = f"quiz_history_p{month:%Y_%m}"
+                conn.execute(text(
+                    f"CREATE TABLE {name} PARTITION OF quiz_history "
+                    f"FOR VALUES FROM ('{month.isoformat()}') TO ('{following.isoformat()}')"
+                ))
+                created.append(name)
+            month = following
+        conn.commit()
+    for name in created:
+        print(f"[Partitions] Created partition '{name}'")
+    return created
+
+
+def _delete_attempt_answers(conn, history_source: str):
+    """Delete the packed answers of the attempts in `history_source`, one batch per transaction."""
+    while True:
+        deleted = conn.execute(text(f"""
+            DELETE FROM quiz_attempt_answers WHERE history_id IN (
+                SELECT a.history_id FROM quiz_attempt_answers a
+                JOIN {history_source} h ON h.id = a.history_id
+                LIMIT :batch
+            )
+        """), {"batch": DELETE_BATCH_SIZE}).rowcount
+        conn.commit()
+        if deleted < DELETE_BATCH_SIZE:
+            return
+
+
+def prune_history(keep_months: int) -> int:
+    """
+    Remove history older than the current month minus `keep_months` months.
+    Drops whole partitions on Postgres; deletes in batches otherwise.
+    Returns the number of partitions dropped or rows deleted.
+    """
+    cutoff = _add_months(_month_start(datetime.now(timezone.utc)), -keep_months)
+
+    with engine.connect() as conn:
+        if is_partitioned(conn):
+            expired = [name for name, _, end in list_partitions(conn) if end <= cutoff]
+            conn.commit()
+            for name in expired:
+                _delete_attempt_answers(conn, name)
+                conn.execute(text(f"ALTER TABLE quiz_history DETACH PARTITION {name}"))
+                conn.execute(text(f"DROP TABLE {name}"))
+                conn.commit()
+                print(f"[Partitions] Dropped partition '{name}'")
+            return len(expired)
+
+        total = 0
+        while True:
+            ids = conn.execute(
+                select(models.QuizHistory.id)
+                .where(models.QuizHistory.completed_at < cutoff)
+                .limit(DELETE_BATCH_SIZE)
+            ).scalars().all()
+            if not ids:
+                break
+            conn.execute(delete(models.QuizAttemptAnswers).where(models.QuizAttemptAnswers.history_id.in_(ids)))
+            conn.execute(delete(models.QuizHistory).where(models.QuizHistory.id.in_(ids)))
+            conn.commit()
+            total += len(ids)
+        print(f"[Partitions] Deleted {total} history rows older than {cutoff:%Y-%m-%d}")
+        return total
+
+
+async def maintain_partitions():
+    """Daily task: keep future partitions ahead and apply HISTORY_RETENTION_MONTHS if set."""
+    while True:
+        try:
+            await asyncio.to_thread(ensure_history_partitions)
+            if HISTORY_RETENTION_MONTHS:
+                await asyncio.to_thread(prune_history, int(HISTORY_RETENTION_MONTHS))
+        except Exception as e:
+            print(f"[Partitions] Maintenance failed: {e}")
+        await asyncio.sleep(MAINTENANCE_INTERVAL)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="quiz_history partition maintenance")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("convert", help="convert quiz_history into a partitioned table (once, at deploy)")
+    ensure = commands.add_parser("ensure", help="create upcoming monthly partitions")
+    ensure.add_argument("--months-ahead", type=int, default=HISTORY_PARTITIONS_AHEAD)
+    prune = commands.add_parser("prune", help="drop history older than the retention window")
+    prune.add_argument("--keep-months", type=int, required=True)
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        convert_quiz_history()
+        ensure_history_partitions()
+    elif args.command == "ensure":
+        ensure_history_partitions(args.months_ahead)
+    else:
+        prune_history(args.keep_months)
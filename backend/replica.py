@@ -0,0 +1,160 @@
+"""
+Routing of read-only sessions to the optional read replica.
+
+Read-your-writes works across workers because the client carries the
+marker: when a user's transaction commits, the response gets a signed
+write marker (X-Write-Marker header and cookie) holding the primary's WAL
+position after the commit. Reads that send it back stay on the primary
+until the replica has replayed up to that position, or at most
+READ_YOUR_WRITES_SECONDS. Every user falls back to the primary while the
+replica lags more than REPLICA_MAX_LAG_SECONDS or cannot be reached.
+"""
+
+import base64
+import hashlib
+import hmac
+import math
+import os
+import time
+
+from fastapi import Response
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session, sessionmaker
+
+from database import engine, session_local, replica_session_local, replica_engine
+
+WRITE_MARKER_HEADER = "X-Write-Marker"
+WRITE_MARKER_COOKIE = "write_marker"
+
+_LAG_QUERY = text("""
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END,
+    pg_last_wal_replay_lsn()::text
+""")
+
+
+def _parse_lsn(value: str | None) -> int:
+    """'16/B374D848' -> integer position, comparable with <."""
+    if not value:
+        return 0
+    high, low = value.split("/")
+    return (int(high, 16) << 32) | int(low, 16)
+
+
+def _signature(user_id: int, lsn: int, written_at: int) -> str:
+    digest = hmac.new(
+        os.getenv("SECRET_KEY", "").encode(), f"{user_id}.{lsn}.{written_at}".encode(), hashlib.sha256
+    ).digest()
+    return base64.urlsafe_b64encode(digest[:16]).decode().rstrip("=")
+
+
+class ReplicaRouter:
+    def __init__(self, write_window: float, max_lag: float, check_interval: float):
+        self.write_window = write_window
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._lag = 0.0
+        self._replay_lsn = 0
+        self._lag_checked = 0.0
+        self.counters = {"replica": 0, "primary_recent_write": 0, "primary_lag": 0, "markers_issued": 0}
+
+    # ---------- write markers ----------
+
+    def write_marker(self, user_id: int) -> str:
+        """Signed marker of the primary's current WAL position (0 when it cannot be read)."""
+        lsn = 0
+        if engine.dialect.name == "postgresql":
+            with engine.connect() as conn:
+                lsn = _parse_lsn(conn.execute(text("SELECT pg_current_wal_lsn()::text")).scalar())
+        written_at = int(time.time() * 1000)
+        self.counters["markers_issued"] += 1
+        return f"{lsn}.{written_at}.{_signature(user_id, lsn, written_at)}"
+
+    def _must_read_primary(self, user_id: int | None, marker: str | None) -> bool:
+        if user_id is None or not marker:
+            return False
+        try:
+            lsn, written_at, signature = marker.split(".")
+            lsn, written_at = int(lsn), int(written_at)
+        except ValueError:
+            return False
+        if not hmac.compare_digest(signature, _signature(user_id, lsn, written_at)):
+            return False
+        if time.time() * 1000 - written_at >= self.write_window * 1000:
+            return False
+        if lsn and replica_engine.dialect.name == "postgresql":
+            self.replica_lag()
+            return self._replay_lsn < lsn
+        # Sin posición WAL: ventana de tiempo completa
+        return True
+
+    # ---------- lag ----------
+
+    def replica_lag(self) -> float:
+        """Replica lag in seconds, measured at most once per check_interval."""
+        now = time.monotonic()
+        if now - self._lag_checked < self.check_interval:
+            return self._lag
+        self._lag_checked = now
+        if replica_engine.dialect.name != "postgresql":
+            # Sin forma de medirlo (p. ej. dos ficheros SQLite en local)
+            self._lag = 0.0
+            return self._lag
+        try:
+            with replica_engine.connect() as conn:
+                lag, replay_lsn = conn.execute(_LAG_QUERY).one()
+            self._lag = float(lag)
+            self._replay_lsn = _parse_lsn(replay_lsn)
+        except Exception as e:
+            print(f"[Replica] Lag check failed: {e}")
+            self._lag = float("inf")
+            self._replay_lsn = 0
+        return self._lag
+
+    def session_factory(self, user_id: int | None, marker: str | None = None) -> sessionmaker:
+        if replica_session_local is None:
+            return session_local
+        if self._must_read_primary(user_id, marker):
+            self.counters["primary_recent_write"] += 1
+            return session_local
+        if self.replica_lag() > self.max_lag:
+            self.counters["primary_lag"] += 1
+            return session_local
+        self.counters["replica"] += 1
+        return replica_session_local
+
+    def metrics(self) -> dict:
+        return {
+            "enabled": replica_session_local is not None,
+            "lag_seconds": self._lag,
+            "replay_lsn": self._replay_lsn,
+            **self.counters,
+        }
+
+
+replica_router = ReplicaRouter(
+    write_window=float(os.getenv("READ_YOUR_WRITES_SECONDS", "5")),
+    max_lag=float(os.getenv("REPLICA_MAX_LAG_SECONDS", "2")),
+    check_interval=float(os.getenv("REPLICA_LAG_CHECK_SECONDS", "1")),
+)
+
+
+@event.listens_for(Session, "after_commit")
+def _issue_write_marker(session: Session):
+    # get_db guarda la respuesta y get_current_user el id del usuario en la sesión principal
+    user_id = session.info.get("user_id")
+    response: Response | None = session.info.get("response")
+    if replica_session_local is None or user_id is None or response is None:
+        return
+    try:
+        marker = replica_router.write_marker(user_id)
+    except Exception as e:
+        print(f"[Replica] Write marker failed: {e}")
+        return
+    response.headers[WRITE_MARKER_HEADER] = marker
+    response.set_cookie(
+        WRITE_MARKER_COOKIE, marker,
+        max_age=math.ceil(replica_router.write_window), httponly=True, samesite="lax"
+    )
@@ -1,4 +1,5 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
 from datetime import timedelta
 
 from auth import (
@@ -9,6 +10,7 @@ from auth import (
     ACCESS_TOKEN_EXPIRE_MINUTES,
     current_user_dependency,
 )
+from admission import auth_admission, client_ip
 from schemas.user import UserCreate, UserLogin, UserResponse, Token
 import models
 
@@ -16,8 +18,10 @@ router = APIRouter(prefix="/auth", tags=["Authentication"])
 
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def register(user_data: UserCreate, db: db_dependency):
+async def register(user_data: UserCreate, request: Request, db: db_dependency):
     """Registrar un nuevo usuario"""
+    auth_admission.admit(client_ip(request))
+
     # Verificar si el email ya existe
     existing_user = db.query(models.Users).filter(
         models.Users.email == user_data.email
@@ -30,7 +34,9 @@ async def register(user_data: UserCreate, db: db_dependency):
         )
 
     # Crear el usuario
-    hashed_password = get_password_hash(user_data.password)
+    # bcrypt se ejecuta fuera del event loop y con concurrencia limitada
+    async with auth_admission.hashing_slot():
+        hashed_password = await run_in_threadpool(get_password_hash, user_data.password)
     db_user = models.Users(
         email=user_data.email,
         hashed_password=hashed_password,
@@ -45,14 +51,22 @@ async def register(user_data: UserCreate, db: db_dependency):
 
 
 @router.post("/login", response_model=Token)
-async def login(user_data: UserLogin, db: db_dependency):
+async def login(user_data: UserLogin, request: Request, db: db_dependency):
     """Iniciar sesión y obtener token"""
+    # Rechazo temprano antes de tocar la base de datos o bcrypt
+    auth_admission.admit(client_ip(request), user_data.email)
+
     # Buscar usuario
     user = db.query(models.Users).filter(
         models.Users.email == user_data.email
     ).first()
 
-    if not user or not verify_password(user_data.password, user.hashed_password):
+    valid = False
+    if user:
+        async with auth_admission.hashing_slot():
+            valid = await run_in_threadpool(verify_password, user_data.password, user.hashed_password)
+
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -69,6 +83,12 @@ async def login(user_data: UserLogin, db: db_dependency):
     return Token(access_token=access_token, token_type="bearer")
 
 
+@router.get("/admission-metrics")
+async def get_admission_metrics(current_user: current_user_dependency):
+    """Métricas del control de admisión de /auth (requiere sesión)"""
+    return auth_admission.metrics()
+
+
 @router.get("/me", response_model=UserResponse)
 async def get_current_user_info(current_user: current_user_dependency):
     """Obtener información del usuario actual"""
@@ -1,16 +1,79 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from typing import List
+from datetime import datetime
+from typing import List, Literal, Optional
+import csv
+import io
 
-from auth import get_db, get_current_user
-from models import QuizHistory, Users
-from schemas.history import QuizHistoryCreate, QuizHistoryResponse
+from auth import get_db, get_read_db, get_current_user
+from database import session_local
+from analytics import pack_answers, aggregate_answers
+from grading import AnswerKey
+from trending import counts_for_trending, record_attempt
+from models import QuizHistory, QuizAttemptAnswers, Quizzes, Questions, Users
+from schemas.history import (
+    QuizHistoryCreate,
+    QuizHistoryResponse,
+    QuizAnalyticsResponse,
+    QuestionAnalytics,
+    ChoiceDistribution,
+)
 
 router = APIRouter(
     prefix="/history",
     tags=["history"]
 )
 
+# Filas leídas por viaje al servidor durante el export
+EXPORT_FETCH_SIZE = 500
+
+EXPORT_COLUMNS = [
+    "id", "quiz_id", "quiz_title", "score", "correct_answers", "total_questions",
+    "time_spent", "is_external", "owner_name", "completed_at", "snapshot_hash",
+]
+
+
+def export_history_rows(user_id: int, since: Optional[datetime], until: Optional[datetime]):
+    """
+    Iterar el historial del usuario con un cursor del lado del servidor.
+    Usa el índice (user_id, completed_at) para el filtro por fechas.
+    """
+    db = session_local()
+    try:
+        query = db.query(QuizHistory).filter(QuizHistory.user_id == user_id)
+        if since is not None:
+            query = query.filter(QuizHistory.completed_at >= since)
+        if until is not None:
+            query = query.filter(QuizHistory.completed_at < until)
+        query = query.order_by(QuizHistory.completed_at, QuizHistory.id)
+
+        for entry in query.yield_per(EXPORT_FETCH_SIZE):
+            yield QuizHistoryResponse.model_validate(entry)
+            # Liberar las filas ya enviadas de la sesión
+            db.expunge(entry)
+    finally:
+        db.close()
+
+
+def history_csv_lines(entries):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue()
+    for entry in entries:
+        buffer.seek(0)
+        buffer.truncate()
+        row = entry.model_dump(mode="json")
+        writer.writerow([row[column] for column in EXPORT_COLUMNS])
+        yield buffer.getvalue()
+
+
+def history_ndjson_lines(entries):
+    for entry in entries:
+        yield entry.model_dump_json() + "\n"
+
 
 @router.post("/", response_model=QuizHistoryResponse)
 def save_quiz_result(
@@ -19,6 +82,36 @@ def save_quiz_result(
     current_user: Users = Depends(get_current_user)
 ):
     """Guardar resultado de un quiz completado"""
+    # Solo se registran intentos de quizzes propios o compartidos públicamente
+    trending = False
+    if history.quiz_id is not None:
+        quiz = db.query(Quizzes).filter(
+            Quizzes.id == history.quiz_id,
+            (Quizzes.user_id == current_user.id) | Quizzes.is_public.is_(True)
+        ).first()
+        if not quiz:
+            raise HTTPException(status_code=404, detail="Quiz no encontrado")
+        # Solo los intentos hechos desde un código compartido cuentan para /share/trending
+        trending = history.is_external and counts_for_trending(db, quiz, current_user.id)
+
+    # Respuestas por pregunta, corregidas en el servidor contra la versión jugada
+    answers = []
+    if history.answers and history.quiz_id is not None:
+        answer_key = AnswerKey.for_attempt(db, history.quiz_id, history.snapshot_hash)
+        if answer_key is None:
+            raise HTTPException(status_code=404, detail="Snapshot no encontrado")
+        seen = set()
+        for answer in history.answers:
+            # Se descartan respuestas a preguntas que no son de este quiz y las repetidas
+            if answer.question_id not in answer_key.answer_types or answer.question_id in seen:
+                continue
+            seen.add(answer.question_id)
+            # Una opción de otra pregunta cuenta como no respondida
+            choice_id = answer.choice_id
+            if choice_id not in answer_key.choices.get(answer.question_id, frozenset()):
+                choice_id = None
+            answers.append((answer.question_id, choice_id, answer_key.is_correct(answer)))
+
     db_history = QuizHistory(
         user_id=current_user.id,
         quiz_id=history.quiz_id,
@@ -28,9 +121,26 @@ def save_quiz_result(
         total_questions=history.total_questions,
         time_spent=history.time_spent,
         is_external=history.is_external,
-        owner_name=history.owner_name
+        owner_name=history.owner_name,
+        snapshot_hash=history.snapshot_hash
     )
     db.add(db_history)
+
+    # Guardar las respuestas empaquetadas en una sola fila
+    if answers:
+        db.flush()
+        question_ids, choice_ids, correct_flags = pack_answers(answers)
+        db.add(QuizAttemptAnswers(
+            history_id=db_history.id,
+            quiz_id=history.quiz_id,
+            question_ids=question_ids,
+            choice_ids=choice_ids,
+            correct_flags=correct_flags
+        ))
+
+    if trending:
+        record_attempt(db, history.quiz_id)
+
     db.commit()
     db.refresh(db_history)
     return db_history
@@ -39,27 +149,63 @@ def save_quiz_result(
 @router.get("/", response_model=List[QuizHistoryResponse])
 def get_my_history(
     limit: int = 50,
-    db: Session = Depends(get_db),
+    since: Optional[datetime] = None,
+    db: Session = Depends(get_read_db),
     current_user: Users = Depends(get_current_user)
 ):
     """Obtener historial de quizzes completados por el usuario"""
-    history = db.query(QuizHistory).filter(
-        QuizHistory.user_id == current_user.id
-    ).order_by(QuizHistory.completed_at.desc()).limit(limit).all()
+    # Orden por completed_at: en Postgres solo se leen las particiones más recientes,
+    # y con `since` las anteriores quedan descartadas al planificar
+    query = db.query(QuizHistory).filter(QuizHistory.user_id == current_user.id)
+    if since is not None:
+        query = query.filter(QuizHistory.completed_at >= since)
+    history = query.order_by(QuizHistory.completed_at.desc()).limit(limit).all()
     return history
 
 
+@router.get("/export")
+def export_my_history(
+    format: Literal["csv", "ndjson"] = "csv",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    current_user: Users = Depends(get_current_user)
+):
+    """Exportar el historial completo como CSV o NDJSON, opcionalmente por rango de fechas"""
+    entries = export_history_rows(current_user.id, since, until)
+    if format == "csv":
+        return StreamingResponse(
+            history_csv_lines(entries),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="history.csv"'}
+        )
+    return StreamingResponse(
+        history_ndjson_lines(entries),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="history.ndjson"'}
+    )
+
+
 @router.get("/stats")
 def get_my_stats(
-    db: Session = Depends(get_db),
+    since: Optional[datetime] = None,
+    db: Session = Depends(get_read_db),
     current_user: Users = Depends(get_current_user)
 ):
-    """Obtener estadísticas generales del usuario"""
-    history = db.query(QuizHistory).filter(
-        QuizHistory.user_id == current_user.id
-    ).all()
+    """Obtener estadísticas generales del usuario (opcionalmente desde una fecha)"""
+    query = db.query(
+        func.count(QuizHistory.id),
+        func.sum(QuizHistory.score),
+        func.sum(QuizHistory.correct_answers),
+        func.sum(QuizHistory.total_questions),
+        func.sum(QuizHistory.time_spent),
+        func.count(QuizHistory.id).filter(QuizHistory.is_external.is_(True))
+    ).filter(QuizHistory.user_id == current_user.id)
+    if since is not None:
+        # Permite descartar particiones completas en Postgres
+        query = query.filter(QuizHistory.completed_at >= since)
+    total_quizzes, total_score, total_correct, total_questions, total_time, external_quizzes = query.one()
 
-    if not history:
+    if not total_quizzes:
         return {
             "total_quizzes": 0,
             "average_score": 0,
@@ -69,23 +215,60 @@ def get_my_stats(
             "external_quizzes": 0
         }
 
-    total_quizzes = len(history)
-    total_score = sum(h.score for h in history)
-    total_correct = sum(h.correct_answers for h in history)
-    total_questions = sum(h.total_questions for h in history)
-    total_time = sum(h.time_spent for h in history)
-    external_quizzes = sum(1 for h in history if h.is_external)
-
     return {
         "total_quizzes": total_quizzes,
-        "average_score": round(total_score / total_quizzes) if total_quizzes > 0 else 0,
-        "total_correct": total_correct,
-        "total_questions": total_questions,
-        "total_time": total_time,
+        "average_score": round((total_score or 0) / total_quizzes),
+        "total_correct": total_correct or 0,
+        "total_questions": total_questions or 0,
+        "total_time": total_time or 0,
         "external_quizzes": external_quizzes
     }
 
 
+@router.get("/quiz/{quiz_id}/analytics", response_model=QuizAnalyticsResponse)
+def get_quiz_analytics(
+    quiz_id: int,
+    db: Session = Depends(get_read_db),
+    current_user: Users = Depends(get_current_user)
+):
+    """Obtener tasa de acierto y distribución de opciones por pregunta de un quiz propio"""
+    quiz = db.query(Quizzes).filter(
+        Quizzes.id == quiz_id,
+        Quizzes.user_id == current_user.id
+    ).first()
+
+    if not quiz:
+        raise HTTPException(status_code=404, detail="Quiz no encontrado")
+
+    rows = db.query(
+        QuizAttemptAnswers.question_ids,
+        QuizAttemptAnswers.choice_ids,
+        QuizAttemptAnswers.correct_flags
+    ).filter(QuizAttemptAnswers.quiz_id == quiz_id).yield_per(1000)
+
+    attempts, stats = aggregate_answers(rows)
+
+    question_texts = dict(
+        db.query(Questions.id, Questions.question_text).filter(Questions.quiz_id == quiz_id).all()
+    )
+
+    questions = [
+        QuestionAnalytics(
+            question_id=question_id,
+            question_text=question_texts.get(question_id),
+            answers=s["answers"],
+            correct_rate=round(s["correct"] / s["answers"], 4) if s["answers"] else 0,
+            choices=[
+                ChoiceDistribution(choice_id=choice_id, count=count)
+                for choice_id, count in sorted(s["choices"].items())
+            ]
+        )
+        for question_id, s in sorted(stats.items())
+    ]
+
+    return QuizAnalyticsResponse(quiz_id=quiz_id, attempts=attempts, questions=questions)
+
+
 @router.delete("/{history_id}")
 def delete_history_entry(
     history_id: int,
@@ -101,6 +284,7 @@ def delete_history_entry(
     if not entry:
         raise HTTPException(status_code=404, detail="Entrada no encontrada")
 
+    db.query(QuizAttemptAnswers).filter(QuizAttemptAnswers.history_id == entry.id).delete()
     db.delete(entry)
     db.commit()
     return {"message": "Entrada eliminada"}
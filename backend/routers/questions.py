@@ -1,6 +1,10 @@
 from fastapi import APIRouter, HTTPException, status
 
 from auth import db_dependency, current_user_dependency
+from cache import invalidate, quiz_keys
+from grading import normalize_answer
+from sampling import fill_ordinal_gap
+from sync import touch, record_deletions
 from schemas.quiz import QuestionBase, QuestionResponse, ChoiceResponse
 import models
 
@@ -36,7 +40,9 @@ async def update_question(
     question.question_text = question_data.question_text
     question.answer_type = question_data.answer_type  # Actualizar tipo de respuesta
 
-    # Eliminar opciones antiguas
+    # Eliminar opciones antiguas (con lápidas para la sincronización)
+    old_choice_ids = [c.id for c in db.query(models.Choices.id).filter(models.Choices.question_id == question_id)]
+    record_deletions(db, current_user.id, "choice", old_choice_ids)
     db.query(models.Choices).filter(models.Choices.question_id == question_id).delete()
 
     # Crear nuevas opciones
@@ -45,11 +51,14 @@ async def update_question(
         db_choice = models.Choices(
             choice_text=choice.choice_text,
             is_correct=choice.is_correct,
-            question_id=question.id
+            question_id=question.id,
+            normalized_text=normalize_answer(choice.choice_text)
         )
         new_choices.append(db_choice)
 
     db.add_all(new_choices)
+    touch(question, quiz)
+    invalidate(db, *quiz_keys(quiz))
     db.commit()
     db.refresh(question)
     for choice in new_choices:
@@ -84,11 +93,11 @@ async def delete_question(
     if not question:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Question not found")
 
-    # Verificar que el quiz pertenece al usuario
+    # Verificar que el quiz pertenece al usuario (bloqueado para reordenar los ordinales)
     quiz = db.query(models.Quizzes).filter(
         models.Quizzes.id == question.quiz_id,
         models.Quizzes.user_id == current_user.id
-    ).first()
+    ).with_for_update().first()
 
     if not quiz:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
@@ -96,6 +105,13 @@ async def delete_question(
     # Eliminar opciones
     db.query(models.Choices).filter(models.Choices.question_id == question_id).delete()
 
-    # Eliminar pregunta
+    # Eliminar pregunta y ocupar su ordinal con la última del quiz
+    db.refresh(question)
+    freed_ordinal = question.ordinal
     db.delete(question)
+    db.flush()
+    fill_ordinal_gap(db, quiz.id, freed_ordinal)
+    record_deletions(db, current_user.id, "question", [question_id])
+    touch(quiz)
+    invalidate(db, *quiz_keys(quiz))
     db.commit()
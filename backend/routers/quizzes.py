@@ -1,6 +1,16 @@
-from fastapi import APIRouter, HTTPException, status
-
-from auth import db_dependency, current_user_dependency
+from fastapi import APIRouter, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+
+from auth import db_dependency, read_db_dependency, current_user_dependency
+from cache import response_cache, invalidate, quiz_keys
+from grading import AnswerKey, normalize_answer, MAX_TYPOS
+from library import export_quiz_lines, import_quiz_lines, iter_lines, LibraryImportError
+from pagination import next_position, question_page, MAX_PAGE_SIZE
+from sampling import next_ordinal, sample_quiz, MAX_SAMPLE_SIZE
+from search import search_user_content
+from share_codes import removed_key
+from snapshots import build_quiz_response, build_quiz_responses, json_array
+from sync import touch, record_deletions
 from schemas.quiz import (
     QuizBase,
     QuizResponse,
@@ -8,16 +18,38 @@ from schemas.quiz import (
     QuestionBase,
     QuestionResponse,
     ChoiceResponse,
+    SearchResult,
+    QuizImportResult,
+    QuizSummaryResponse,
+    QuestionPage,
+    GradeRequest,
+    GradeResponse,
 )
 import models
 
 router = APIRouter(prefix="/quizzes", tags=["Quizzes"])
 
+MAX_BATCH_SIZE = 50
+
+
+def parse_batch_ids(ids: str) -> list[int]:
+    """Ids separados por comas, sin duplicados y en el orden pedido"""
+    try:
+        parsed = list(dict.fromkeys(int(part) for part in ids.split(",") if part.strip()))
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid ids")
+    if not parsed or len(parsed) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Between 1 and {MAX_BATCH_SIZE} ids are allowed"
+        )
+    return parsed
+
 
 # ==================== QUIZ ENDPOINTS ====================
 
 @router.get("/", response_model=list[QuizListResponse])
-async def get_all_quizzes(db: db_dependency, current_user: current_user_dependency):
+async def get_all_quizzes(db: read_db_dependency, current_user: current_user_dependency):
     """Obtener todos los quizzes del usuario actual"""
     quizzes = db.query(models.Quizzes).filter(
         models.Quizzes.user_id == current_user.id
@@ -37,9 +69,86 @@ async def get_all_quizzes(db: db_dependency, current_user: current_user_dependen
     return result
 
 
+@router.get("/search", response_model=list[SearchResult])
+async def search_quizzes(
+    db: read_db_dependency,
+    current_user: current_user_dependency,
+    q: str = Query(min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0)
+):
+    """Buscar en títulos, preguntas y opciones de los quizzes del usuario"""
+    hits = search_user_content(db, current_user.id, q, limit, offset)
+    return [SearchResult(**hit) for hit in hits]
+
+
+@router.get("/export")
+async def export_quizzes(current_user: current_user_dependency):
+    """Exportar todos los quizzes del usuario como NDJSON (un quiz por línea)"""
+    return StreamingResponse(
+        export_quiz_lines(current_user.id),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="quizzes.ndjson"'}
+    )
+
+
+@router.post("/import", response_model=QuizImportResult, status_code=status.HTTP_201_CREATED)
+async def import_quizzes(request: Request, db: db_dependency, current_user: current_user_dependency):
+    """Importar quizzes desde un cuerpo NDJSON, insertándolos por bloques"""
+    try:
+        quizzes, questions = await import_quiz_lines(db, current_user.id, iter_lines(request.stream()))
+    except LibraryImportError as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    db.commit()
+    return QuizImportResult(quizzes=quizzes, questions=questions)
+
+
+@router.get("/batch", response_model=list[QuizResponse])
+async def get_quizzes_batch(
+    db: db_dependency,
+    current_user: current_user_dependency,
+    ids: str = Query(min_length=1)
+):
+    """Obtener varios quizzes completos (ids separados por comas) en una sola petición"""
+    quiz_ids = parse_batch_ids(ids)
+
+    responses = {}
+    for quiz_id in quiz_ids:
+        cached = response_cache.get(f"quiz:{quiz_id}")
+        if cached is not None and cached.user_id == current_user.id:
+            responses[quiz_id] = cached
+
+    missing = [quiz_id for quiz_id in quiz_ids if quiz_id not in responses]
+    if missing:
+        cache_token = response_cache.begin()
+        # Comprobación de propiedad de todos los ids en una sola consulta
+        quizzes = db.query(models.Quizzes).filter(
+            models.Quizzes.id.in_(missing),
+            models.Quizzes.user_id == current_user.id
+        ).all()
+        if len(quizzes) != len(missing):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Quiz not found")
+
+        for response in build_quiz_responses(db, quizzes):
+            response_cache.set(f"quiz:{response.id}", response, cache_token)
+            responses[response.id] = response
+
+    return StreamingResponse(
+        json_array(responses[quiz_id].model_dump_json().encode() for quiz_id in quiz_ids),
+        media_type="application/json"
+    )
+
+
 @router.get("/{quiz_id}", response_model=QuizResponse)
 async def get_quiz(quiz_id: int, db: db_dependency, current_user: current_user_dependency):
     """Obtener un quiz con todas sus preguntas y opciones"""
+    cached = response_cache.get(f"quiz:{quiz_id}")
+    if cached is not None and cached.user_id == current_user.id:
+        return cached
+
+    cache_token = response_cache.begin()
     quiz = db.query(models.Quizzes).filter(
         models.Quizzes.id == quiz_id,
         models.Quizzes.user_id == current_user.id
@@ -48,33 +157,78 @@ async def get_quiz(quiz_id: int, db: db_dependency, current_user: current_user_d
     if not quiz:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Quiz not found")
 
-    questions = db.query(models.Questions).filter(models.Questions.quiz_id == quiz_id).all()
+    response = build_quiz_response(db, quiz)
+    response_cache.set(f"quiz:{quiz_id}", response, cache_token)
+    return response
 
-    questions_response = []
-    for question in questions:
-        choices = db.query(models.Choices).filter(
-            models.Choices.question_id == question.id
-        ).all()
-        questions_response.append(QuestionResponse(
-            id=question.id,
-            question_text=question.question_text,
-            answer_type=question.answer_type,
-            quiz_id=question.quiz_id,
-            choices=[ChoiceResponse(
-                id=c.id,
-                choice_text=c.choice_text,
-                is_correct=c.is_correct,
-                question_id=c.question_id
-            ) for c in choices]
-        ))
 
-    return QuizResponse(
-        id=quiz.id,
-        title=quiz.title,
-        created_at=quiz.created_at,
-        user_id=quiz.user_id,
-        questions=questions_response
-    )
+@router.get("/{quiz_id}/sample", response_model=QuizResponse)
+async def get_quiz_sample(
+    quiz_id: int,
+    db: read_db_dependency,
+    current_user: current_user_dependency,
+    n: int = Query(20, ge=1, le=MAX_SAMPLE_SIZE),
+    seed: int | None = None
+):
+    """Obtener un quiz con N preguntas al azar (reproducible con seed)"""
+    quiz = db.query(models.Quizzes).filter(
+        models.Quizzes.id == quiz_id,
+        models.Quizzes.user_id == current_user.id
+    ).first()
+
+    if not quiz:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Quiz not found")
+
+    return sample_quiz(db, quiz, n, seed)
+
+
+@router.get("/{quiz_id}/questions", response_model=QuestionPage)
+async def get_quiz_questions(
+    quiz_id: int,
+    db: read_db_dependency,
+    current_user: current_user_dependency,
+    cursor: str | None = None,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE)
+):
+    """Obtener las preguntas de un quiz por páginas (paginación por cursor)"""
+    quiz = db.query(models.Quizzes.id).filter(
+        models.Quizzes.id == quiz_id,
+        models.Quizzes.user_id == current_user.id
+    ).first()
+
+    if not quiz:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Quiz not found")
+
+    return question_page(db, quiz_id, cursor, limit)
+
+
+@router.post("/{quiz_id}/grade", response_model=GradeResponse)
+async def grade_attempt(
+    quiz_id: int,
+    attempt: GradeRequest,
+    db: read_db_dependency,
+    current_user: current_user_dependency,
+    max_typos: int = Query(0, ge=0, le=MAX_TYPOS)
+):
+    """
+    Corregir todas las respuestas de un intento (opciones y texto) de una vez.
+    Con snapshot_hash se corrige contra la versión publicada que se jugó.
+    """
+    # Quiz propio o compartido públicamente
+    quiz = db.query(models.Quizzes.id).filter(
+        models.Quizzes.id == quiz_id,
+        (models.Quizzes.user_id == current_user.id) | models.Quizzes.is_public.is_(True)
+    ).first()
+
+    if not quiz:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Quiz not found")
+
+    answer_key = AnswerKey.for_attempt(db, quiz_id, attempt.snapshot_hash)
+    # El snapshot tiene que ser una versión de este quiz
+    if answer_key is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Snapshot not found")
+
+    return answer_key.grade(attempt.answers, max_typos)
 
 
 @router.post("/", response_model=QuizResponse, status_code=status.HTTP_201_CREATED)
@@ -94,9 +248,15 @@ async def create_quiz(quiz: QuizBase, db: db_dependency, current_user: current_u
     )
 
 
-@router.put("/{quiz_id}", response_model=QuizResponse)
-async def update_quiz(quiz_id: int, quiz_data: QuizBase, db: db_dependency, current_user: current_user_dependency):
-    """Actualizar el título de un quiz"""
+@router.put("/{quiz_id}", response_model=QuizResponse | QuizSummaryResponse)
+async def update_quiz(
+    quiz_id: int,
+    quiz_data: QuizBase,
+    db: db_dependency,
+    current_user: current_user_dependency,
+    include_questions: bool = True
+):
+    """Actualizar el título de un quiz (include_questions=false devuelve solo el quiz)"""
     quiz = db.query(models.Quizzes).filter(
         models.Quizzes.id == quiz_id,
         models.Quizzes.user_id == current_user.id
@@ -106,36 +266,20 @@ async def update_quiz(quiz_id: int, quiz_data: QuizBase, db: db_dependency, curr
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Quiz not found")
 
     quiz.title = quiz_data.title
+    invalidate(db, *quiz_keys(quiz))
     db.commit()
     db.refresh(quiz)
 
-    # Obtener preguntas para la respuesta
-    questions = db.query(models.Questions).filter(models.Questions.quiz_id == quiz_id).all()
-    questions_response = []
-    for question in questions:
-        choices = db.query(models.Choices).filter(
-            models.Choices.question_id == question.id
-        ).all()
-        questions_response.append(QuestionResponse(
-            id=question.id,
-            question_text=question.question_text,
-            answer_type=question.answer_type,
-            quiz_id=question.quiz_id,
-            choices=[ChoiceResponse(
-                id=c.id,
-                choice_text=c.choice_text,
-                is_correct=c.is_correct,
-                question_id=c.question_id
-            ) for c in choices]
-        ))
+    if not include_questions:
+        return QuizSummaryResponse(
+            id=quiz.id,
+            title=quiz.title,
+            created_at=quiz.created_at,
+            user_id=quiz.user_id
+        )
 
-    return QuizResponse(
-        id=quiz.id,
-        title=quiz.title,
-        created_at=quiz.created_at,
-        user_id=quiz.user_id,
-        questions=questions_response
-    )
+    # Mismo árbol que GET /quizzes/{id}: dos consultas en total
+    return build_quiz_response(db, quiz)
 
 
 @router.delete("/{quiz_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -157,7 +301,19 @@ async def delete_quiz(quiz_id: int, db: db_dependency, current_user: current_use
     # Eliminar preguntas
     db.query(models.Questions).filter(models.Questions.quiz_id == quiz_id).delete()
 
-    # Eliminar quiz
+    # Eliminar respuestas por pregunta y contador de tendencia del quiz
+    db.query(models.QuizAttemptAnswers).filter(models.QuizAttemptAnswers.quiz_id == quiz_id).delete()
+    db.query(models.QuizTrending).filter(models.QuizTrending.quiz_id == quiz_id).delete()
+    # El historial se conserva sin enlace al quiz (la FK de tablas antiguas no tiene ON DELETE)
+    db.query(models.QuizHistory).filter(models.QuizHistory.quiz_id == quiz_id).update(
+        {models.QuizHistory.quiz_id: None}, synchronize_session=False
+    )
+
+    # Eliminar quiz (la lápida del quiz cubre sus preguntas y opciones)
+    record_deletions(db, current_user.id, "quiz", [quiz_id])
+    invalidate(db, *quiz_keys(quiz))
+    if quiz.share_code:
+        invalidate(db, removed_key(quiz.share_code))
     db.delete(quiz)
     db.commit()
 
@@ -172,11 +328,11 @@ async def add_question_to_quiz(
     current_user: current_user_dependency
 ):
     """Agregar una pregunta a un quiz"""
-    # Verificar que el quiz existe y pertenece al usuario
+    # Verificar que el quiz existe y pertenece al usuario (bloqueado para asignar el ordinal)
     quiz = db.query(models.Quizzes).filter(
         models.Quizzes.id == quiz_id,
         models.Quizzes.user_id == current_user.id
-    ).first()
+    ).with_for_update().first()
 
     if not quiz:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Quiz not found")
@@ -185,11 +341,12 @@ async def add_question_to_quiz(
     db_question = models.Questions(
         question_text=question.question_text,
         answer_type=question.answer_type,
-        quiz_id=quiz_id
+        quiz_id=quiz_id,
+        ordinal=next_ordinal(db, quiz_id),
+        position=next_position(db, quiz_id)
     )
     db.add(db_question)
-    db.commit()
-    db.refresh(db_question)
+    db.flush()
 
     # Crear las opciones
     choices_list = []
@@ -197,13 +354,19 @@ async def add_question_to_quiz(
         db_choice = models.Choices(
             choice_text=choice.choice_text,
             is_correct=choice.is_correct,
-            question_id=db_question.id
+            question_id=db_question.id,
+            normalized_text=normalize_answer(choice.choice_text)
         )
-        db.add(db_choice)
-        db.commit()
-        db.refresh(db_choice)
         choices_list.append(db_choice)
 
+    db.add_all(choices_list)
+    touch(quiz)
+    invalidate(db, *quiz_keys(quiz))
+    db.commit()
+    db.refresh(db_question)
+    for db_choice in choices_list:
+        db.refresh(db_choice)
+
     return QuestionResponse(
         id=db_question.id,
         question_text=db_question.question_text,
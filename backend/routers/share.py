@@ -1,14 +1,29 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+import asyncio
+import json
 import secrets
 import string
-
-from auth import db_dependency, current_user_dependency
-from schemas.quiz import QuizResponse, QuestionResponse, ChoiceResponse
-from schemas.share import ShareCodeResponse, SharedQuizInfo
+from typing import Annotated
+
+from auth import db_dependency, read_db_dependency, current_user_dependency, get_current_user
+from cache import response_cache, invalidate, quiz_keys
+from database import session_local
+from library import write_quizzes
+from live import join_room, leave_room
+from sampling import sample_snapshot, MAX_SAMPLE_SIZE
+from schemas.quiz import QuizExport, QuizResponse, QuizListResponse
+from share_codes import share_code_filter, added_key, removed_key
+from snapshots import publish_snapshot, get_snapshot_content, get_snapshot_contents, json_array
+from schemas.share import ShareCodeResponse, SharedQuizInfo, TrendingQuiz
+from trending import trending_feed, TRENDING_SIZE
 import models
 
 router = APIRouter(prefix="/share", tags=["Share"])
 
+MAX_BATCH_SIZE = 50
+
 
 # ==================== HELPERS ====================
 
@@ -20,6 +35,70 @@ def generate_share_code(length: int = 6) -> str:
     return ''.join(secrets.choice(characters) for _ in range(length))
 
 
+def known_share_code(share_code: str) -> str:
+    """
+    Código normalizado. Responde 404 sin consultar la base de datos si el código
+    no está asignado a ningún quiz; se declara antes que la sesión y el usuario
+    para rechazarlo también antes de la autenticación.
+    """
+    code = share_code.upper()
+    if not share_code_filter.might_contain(code):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Código inválido o quiz no disponible"
+        )
+    return code
+
+
+def known_share_codes(codes: str = Query(min_length=1)) -> list[str]:
+    """Versión de known_share_code para una lista de códigos separados por comas"""
+    share_codes = list(dict.fromkeys(code.strip().upper() for code in codes.split(",") if code.strip()))
+    if not share_codes or len(share_codes) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Entre 1 y {MAX_BATCH_SIZE} códigos por petición"
+        )
+    for code in share_codes:
+        if not share_code_filter.might_contain(code):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Código inválido o quiz no disponible"
+            )
+    return share_codes
+
+
+known_share_code_dependency = Annotated[str, Depends(known_share_code)]
+
+
+def published_snapshot_hash(db: Session, code: str) -> str:
+    """Hash del snapshot publicado bajo un código (en caché); 404 si el código no es válido."""
+    cache_key = f"share:{code}"
+    snapshot_hash = response_cache.get(cache_key)
+    if snapshot_hash is not None:
+        return snapshot_hash
+
+    cache_token = response_cache.begin()
+    quiz = db.query(models.Quizzes).filter(
+        models.Quizzes.share_code == code,
+        models.Quizzes.is_public.is_(True)
+    ).first()
+
+    if not quiz:
+        share_code_filter.record_false_positive()
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Código inválido o quiz no disponible"
+        )
+
+    # Quizzes compartidos antes de existir los snapshots
+    if quiz.snapshot_hash is None:
+        publish_snapshot(db, quiz)
+        db.commit()
+
+    response_cache.set(cache_key, quiz.snapshot_hash, cache_token)
+    return quiz.snapshot_hash
+
+
 # ==================== ENDPOINTS ====================
 
 @router.post("/{quiz_id}/generate-code", response_model=ShareCodeResponse)
@@ -28,7 +107,7 @@ async def generate_quiz_share_code(
     db: db_dependency,
     current_user: current_user_dependency
 ):
-    """Generar un código único para compartir el quiz"""
+    """Generar un código único para compartir el quiz y publicar su versión actual"""
     quiz = db.query(models.Quizzes).filter(
         models.Quizzes.id == quiz_id,
         models.Quizzes.user_id == current_user.id
@@ -40,8 +119,11 @@ async def generate_quiz_share_code(
             detail="Quiz no encontrado o no tienes permiso"
         )
 
-    # Si ya tiene código, devolver el existente
+    # Si ya tiene código, republicar el snapshot y devolver el código existente
     if quiz.share_code:
+        invalidate(db, *quiz_keys(quiz))
+        publish_snapshot(db, quiz)
+        db.commit()
         return ShareCodeResponse(
             share_code=quiz.share_code,
             message="Código existente"
@@ -64,6 +146,8 @@ async def generate_quiz_share_code(
 
     quiz.share_code = code
     quiz.is_public = True
+    publish_snapshot(db, quiz)
+    invalidate(db, *quiz_keys(quiz), added_key(code))
     db.commit()
 
     return ShareCodeResponse(
@@ -90,6 +174,9 @@ async def revoke_share_code(
             detail="Quiz no encontrado"
         )
 
+    invalidate(db, *quiz_keys(quiz))
+    if quiz.share_code:
+        invalidate(db, removed_key(quiz.share_code))
     quiz.share_code = None
     quiz.is_public = False
     db.commit()
@@ -99,17 +186,18 @@ async def revoke_share_code(
 
 @router.get("/code/{share_code}", response_model=SharedQuizInfo)
 async def get_quiz_info_by_code(
-    share_code: str,
-    db: db_dependency,
+    code: known_share_code_dependency,
+    db: read_db_dependency,
     current_user: current_user_dependency
 ):
     """Obtener información de un quiz por su código (sin las respuestas correctas)"""
     quiz = db.query(models.Quizzes).filter(
-        models.Quizzes.share_code == share_code.upper(),
+        models.Quizzes.share_code == code,
         models.Quizzes.is_public.is_(True)
     ).first()
 
     if not quiz:
+        share_code_filter.record_false_positive()
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Código inválido o quiz no disponible"
@@ -135,59 +223,238 @@ async def get_quiz_info_by_code(
     )
 
 
+def snapshot_response(request: Request, snapshot_hash: str, content: bytes, cache_control: str) -> Response:
+    """Respuesta JSON de un snapshot con ETag; 304 si el cliente ya tiene esa versión"""
+    headers = {
+        "ETag": f'"{snapshot_hash}"',
+        "Cache-Control": cache_control,
+        "X-Quiz-Snapshot": snapshot_hash,
+    }
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=content, media_type="application/json", headers=headers)
+
+
 @router.get("/code/{share_code}/full", response_model=QuizResponse)
 async def get_shared_quiz_full(
-    share_code: str,
+    code: known_share_code_dependency,
+    request: Request,
     db: db_dependency,
     current_user: current_user_dependency
 ):
-    """Obtener un quiz compartido completo con preguntas y opciones para jugarlo"""
-    quiz = db.query(models.Quizzes).filter(
-        models.Quizzes.share_code == share_code.upper(),
-        models.Quizzes.is_public.is_(True)
-    ).first()
+    """Obtener la versión publicada de un quiz compartido para jugarlo"""
+    snapshot_hash = published_snapshot_hash(db, code)
+    content = get_snapshot_content(db, snapshot_hash)
+    # El código puede apuntar a otra versión más adelante: revalidar siempre con el ETag
+    return snapshot_response(request, snapshot_hash, content, "private, no-cache")
 
-    if not quiz:
+
+@router.get("/batch", response_model=list[QuizResponse])
+async def get_shared_quizzes_batch(
+    share_codes: Annotated[list[str], Depends(known_share_codes)],
+    db: db_dependency,
+    current_user: current_user_dependency
+):
+    """Obtener las versiones publicadas de varios quizzes compartidos (códigos separados por comas)"""
+
+    hashes = {}
+    for code in share_codes:
+        snapshot_hash = response_cache.get(f"share:{code}")
+        if snapshot_hash is not None:
+            hashes[code] = snapshot_hash
+
+    missing = [code for code in share_codes if code not in hashes]
+    if missing:
+        cache_token = response_cache.begin()
+        quizzes = db.query(models.Quizzes).filter(
+            models.Quizzes.share_code.in_(missing),
+            models.Quizzes.is_public.is_(True)
+        ).all()
+        if len(quizzes) != len(missing):
+            share_code_filter.record_false_positive()
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Código inválido o quiz no disponible"
+            )
+
+        published = False
+        for quiz in quizzes:
+            # Quizzes compartidos antes de existir los snapshots
+            if quiz.snapshot_hash is None:
+                publish_snapshot(db, quiz)
+                published = True
+            hashes[quiz.share_code] = quiz.snapshot_hash
+        if published:
+            db.commit()
+
+        for code in missing:
+            response_cache.set(f"share:{code}", hashes[code], cache_token)
+
+    contents = get_snapshot_contents(db, list(set(hashes.values())))
+    # Los snapshots ya están serializados: se envían tal cual
+    return StreamingResponse(
+        json_array(contents[hashes[code]] for code in share_codes),
+        media_type="application/json",
+        headers={"Cache-Control": "private, no-cache"}
+    )
+
+
+@router.get("/snapshots/{snapshot_hash}", response_model=QuizResponse)
+async def get_quiz_snapshot(
+    snapshot_hash: str,
+    request: Request,
+    db: db_dependency,
+    current_user: current_user_dependency
+):
+    """Obtener un snapshot inmutable de un quiz por su hash"""
+    content = get_snapshot_content(db, snapshot_hash.lower())
+    if content is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="Código inválido o quiz no disponible"
+            detail="Snapshot no encontrado"
         )
 
-    # Obtener preguntas con sus opciones
-    questions = db.query(models.Questions).filter(
-        models.Questions.quiz_id == quiz.id
-    ).all()
+    return snapshot_response(request, snapshot_hash.lower(), content, "private, max-age=31536000, immutable")
 
-    questions_response = []
-    for question in questions:
-        choices = db.query(models.Choices).filter(
-            models.Choices.question_id == question.id
-        ).all()
-        questions_response.append(QuestionResponse(
-            id=question.id,
-            question_text=question.question_text,
-            answer_type=question.answer_type,
-            quiz_id=question.quiz_id,
-            choices=[ChoiceResponse(
-                id=c.id,
-                choice_text=c.choice_text,
-                is_correct=c.is_correct,
-                question_id=c.question_id
-            ) for c in choices]
-        ))
 
-    return QuizResponse(
-        id=quiz.id,
-        title=quiz.title,
-        created_at=quiz.created_at,
-        user_id=quiz.user_id,
-        questions=questions_response
+@router.get("/code/{share_code}/sample", response_model=QuizResponse)
+async def get_shared_quiz_sample(
+    code: known_share_code_dependency,
+    db: db_dependency,
+    current_user: current_user_dependency,
+    n: int = Query(20, ge=1, le=MAX_SAMPLE_SIZE),
+    seed: int | None = None
+):
+    """Obtener N preguntas al azar de la versión publicada de un quiz compartido (reproducible con seed)"""
+    snapshot_hash = published_snapshot_hash(db, code)
+    return sample_snapshot(snapshot_hash, get_snapshot_content(db, snapshot_hash), n, seed)
+
+
+@router.post("/code/{share_code}/clone", response_model=QuizListResponse, status_code=status.HTTP_201_CREATED)
+async def clone_shared_quiz(
+    code: known_share_code_dependency,
+    db: db_dependency,
+    current_user: current_user_dependency
+):
+    """
+    Copiar la versión publicada de un quiz compartido a la biblioteca del usuario
+    en una sola transacción. Se copia el snapshot, no el quiz actual: los cambios
+    sin publicar del dueño no salen de su biblioteca.
+    """
+    snapshot_hash = published_snapshot_hash(db, code)
+    source = QuizExport.model_validate_json(get_snapshot_content(db, snapshot_hash))
+
+    (quiz_id,), question_count = write_quizzes(db, current_user.id, [source])
+    db.commit()
+    db_quiz = db.get(models.Quizzes, quiz_id)
+
+    return QuizListResponse(
+        id=db_quiz.id,
+        title=db_quiz.title,
+        created_at=db_quiz.created_at,
+        question_count=question_count
     )
 
 
+@router.websocket("/code/{share_code}/live")
+async def live_quiz_room(websocket: WebSocket, share_code: str, token: str):
+    """
+    Sala en vivo de un quiz compartido. El token JWT va como parámetro de consulta.
+    El dueño del quiz envía {"type": "next"} / {"type": "end"};
+    los jugadores envían {"type": "answer", "choice_id": ...} o {"type": "answer", "text": ...}.
+    """
+    code = share_code.upper()
+
+    # Sesión corta: no mantener una conexión a la base de datos por socket
+    db = session_local()
+    try:
+        try:
+            user = await get_current_user(token, db)
+        except HTTPException:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+            return
+
+        quiz = db.query(models.Quizzes).filter(
+            models.Quizzes.share_code == code,
+            models.Quizzes.is_public.is_(True)
+        ).first()
+        if not quiz:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Código inválido o quiz no disponible")
+            return
+
+        if quiz.snapshot_hash is None:
+            publish_snapshot(db, quiz)
+            db.commit()
+        # Contenido en caché por hash: solo se decodifica si hay que crear la sala
+        content = get_snapshot_content(db, quiz.snapshot_hash)
+        host_id = quiz.user_id
+        user_id, user_name = user.id, user.name
+    finally:
+        db.close()
+
+    await websocket.accept()
+    room, slot = await join_room(code, host_id, content, user_id, user_name, websocket)
+    try:
+        await websocket.send_text(json.dumps({
+            "type": "joined",
+            "role": "host" if slot is None else "player",
+            "title": room.title,
+            "total": len(room.question_messages),
+        }))
+        if slot is not None and 0 <= room.current < len(room.question_messages):
+            await websocket.send_text(room.question_messages[room.current])
+
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except ValueError:
+                continue
+            # Mensajes mal formados se ignoran sin cerrar la conexión
+            if not isinstance(message, dict):
+                continue
+
+            kind = message.get("type")
+            if slot is None:
+                if kind == "next":
+                    await room.advance()
+                elif kind == "end":
+                    await room.finish()
+            elif kind == "answer":
+                choice_id, answer_text = message.get("choice_id"), message.get("text")
+                # bool es subclase de int
+                valid_choice = choice_id is None or (isinstance(choice_id, int) and not isinstance(choice_id, bool))
+                if not valid_choice or not (answer_text is None or isinstance(answer_text, str)):
+                    continue
+                correct = room.answer(slot, choice_id, answer_text)
+                if correct is not None:
+                    await websocket.send_text(json.dumps({
+                        "type": "answer_result",
+                        "correct": correct,
+                        "score": room.scores[slot],
+                    }))
+    except WebSocketDisconnect:
+        pass
+    except RuntimeError:
+        # La difusión ya cerró este socket por lento (1013)
+        pass
+    finally:
+        await leave_room(room, slot, websocket)
+
+
+@router.get("/trending", response_model=list[TrendingQuiz])
+async def get_trending_quizzes(
+    current_user: current_user_dependency,
+    limit: int = Query(20, ge=1, le=TRENDING_SIZE)
+):
+    """Quizzes públicos con más intentos recientes (ranking en memoria, refrescado periódicamente)"""
+    if trending_feed.refreshed_at is None:
+        await asyncio.to_thread(trending_feed.refresh)
+    return trending_feed.items[:limit]
+
+
 @router.get("/my-shared", response_model=list[SharedQuizInfo])
 async def get_my_shared_quizzes(
-    db: db_dependency,
+    db: read_db_dependency,
     current_user: current_user_dependency
 ):
     """Obtener mis quizzes que tienen código de compartir activo"""
@@ -0,0 +1,20 @@
+from typing import Optional
+
+from fastapi import APIRouter
+
+from auth import db_dependency, current_user_dependency
+from schemas.sync import SyncResponse
+from sync import changes_since
+
+router = APIRouter(prefix="/sync", tags=["Sync"])
+
+
+@router.get("", response_model=SyncResponse)
+async def sync_library(
+    db: db_dependency,
+    current_user: current_user_dependency,
+    since: Optional[str] = None
+):
+    """Cambios de la biblioteca del usuario desde el token (todo si no se envía)"""
+    # Siempre en la base principal: el token sale de su reloj y no debe adelantar a la réplica
+    return changes_since(db, current_user.id, since)
@@ -0,0 +1,105 @@
+"""
+Random sampling of questions from large quizzes.
+
+Each question has a dense ordinal 0..n-1 within its quiz, kept dense on
+insert (next ordinal) and delete (the last question takes the freed slot).
+A sample draws N ordinals in memory and fetches them through the
+(quiz_id, ordinal) index, so its cost depends on N, not on the quiz size.
+Shared quizzes are sampled from their published snapshot instead, whose
+decoded question list is kept per hash (snapshots never change).
+"""
+
+import json
+import random
+from collections import OrderedDict
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from schemas.quiz import QuizResponse, QuestionResponse, ChoiceResponse
+import models
+
+MAX_SAMPLE_SIZE = 200
+
+# Snapshots decodificados que se conservan para muestrear
+PARSED_SNAPSHOTS = 32
+
+_parsed_snapshots: OrderedDict[str, dict] = OrderedDict()
+
+
+def next_ordinal(db: Session, quiz_id: int) -> int:
+    """Ordinal for a new question appended to the quiz."""
+    last = db.query(func.max(models.Questions.ordinal)).filter(
+        models.Questions.quiz_id == quiz_id
+    ).scalar()
+    return 0 if last is None else last + 1
+
+
+def fill_ordinal_gap(db: Session, quiz_id: int, freed: int | None):
+    """After deleting the question at `freed`, move the last question into that slot."""
+    if freed is None:
+        return
+    last = db.query(models.Questions).filter(
+        models.Questions.quiz_id == quiz_id
+    ).order_by(models.Questions.ordinal.desc()).first()
+    if last is not None and last.ordinal is not None and last.ordinal > freed:
+        last.ordinal = freed
+
+
+def sample_quiz(db: Session, quiz: models.Quizzes, n: int, seed: int | None) -> QuizResponse:
+    """Return the quiz with N random questions. The same seed gives the same sample."""
+    count = next_ordinal(db, quiz.id)
+    rng = random.Random(seed)
+    ordinals = rng.sample(range(count), min(n, count))
+
+    questions = db.query(models.Questions).filter(
+        models.Questions.quiz_id == quiz.id,
+        models.Questions.ordinal.in_(ordinals)
+    ).all() if ordinals else []
+    by_ordinal = {q.ordinal: q for q in questions}
+
+    choices_by_question: dict[int, list[ChoiceResponse]] = {q.id: [] for q in questions}
+    if questions:
+        choices = db.query(models.Choices).filter(
+            models.Choices.question_id.in_(choices_by_question.keys())
+        ).order_by(models.Choices.id).all()
+        for c in choices:
+            choices_by_question[c.question_id].append(ChoiceResponse(
+                id=c.id,
+                choice_text=c.choice_text,
+                is_correct=c.is_correct,
+                question_id=c.question_id
+            ))
+
+    return QuizResponse(
+        id=quiz.id,
+        title=quiz.title,
+        created_at=quiz.created_at,
+        user_id=quiz.user_id,
+        questions=[QuestionResponse(
+            id=q.id,
+            question_text=q.question_text,
+            answer_type=q.answer_type,
+            quiz_id=q.quiz_id,
+            choices=choices_by_question[q.id]
+        ) for q in (by_ordinal[o] for o in ordinals if o in by_ordinal)]
+    )
+
+
+def _parsed_snapshot(snapshot_hash: str, content: bytes) -> dict:
+    quiz = _parsed_snapshots.pop(snapshot_hash, None)
+    if quiz is None:
+        quiz = json.loads(content)
+    _parsed_snapshots[snapshot_hash] = quiz
+    if len(_parsed_snapshots) > PARSED_SNAPSHOTS:
+        _parsed_snapshots.popitem(last=False)
+    return quiz
+
+
+def sample_snapshot(snapshot_hash: str, content: bytes, n: int, seed: int | None) -> dict:
+    """Same as sample_quiz, over the questions of a published snapshot."""
+    quiz = _parsed_snapshot(snapshot_hash, content)
+    questions = quiz["questions"]
+    rng = random.Random(seed)
+    indexes = rng.sample(range(len(questions)), min(n, len(questions)))
+    return {**quiz, "questions": [questions[i] for i in indexes]}
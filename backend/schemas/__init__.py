@@ -3,3 +3,4 @@ from .quiz import *
 from .user import *
 from .share import *
 from .history import *
+from .sync import *
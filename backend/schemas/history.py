@@ -1,6 +1,16 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
+
+
+# Los ids se guardan empaquetados como int32 (ver analytics.py)
+MAX_ID = 2**31 - 1
+
+
+class AttemptAnswer(BaseModel):
+    question_id: int = Field(ge=1, le=MAX_ID)
+    choice_id: Optional[int] = Field(None, ge=1, le=MAX_ID)  # None en preguntas de texto o sin responder
+    text: Optional[str] = None  # Preguntas de texto; el acierto se calcula en el servidor
 
 
 class QuizHistoryCreate(BaseModel):
@@ -12,6 +22,8 @@ class QuizHistoryCreate(BaseModel):
     time_spent: int
     is_external: bool = False
     owner_name: Optional[str] = None
+    snapshot_hash: Optional[str] = None  # Versión jugada (cabecera X-Quiz-Snapshot)
+    answers: Optional[List[AttemptAnswer]] = None  # Respuestas por pregunta (opcional)
 
 
 class QuizHistoryResponse(BaseModel):
@@ -25,6 +37,26 @@ class QuizHistoryResponse(BaseModel):
     is_external: bool
     owner_name: Optional[str]
     completed_at: datetime
+    snapshot_hash: Optional[str] = None
 
     class Config:
         from_attributes = True
+
+
+class ChoiceDistribution(BaseModel):
+    choice_id: int  # 0 = sin opción elegida
+    count: int
+
+
+class QuestionAnalytics(BaseModel):
+    question_id: int
+    question_text: Optional[str]  # None si la pregunta ya fue eliminada
+    answers: int
+    correct_rate: float
+    choices: List[ChoiceDistribution]
+
+
+class QuizAnalyticsResponse(BaseModel):
+    quiz_id: int
+    attempts: int
+    questions: List[QuestionAnalytics]
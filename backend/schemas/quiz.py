@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 
 
@@ -33,10 +33,25 @@ class QuestionResponse(BaseModel):
         from_attributes = True
 
 
+class QuestionPage(BaseModel):
+    questions: List[QuestionResponse]
+    next_cursor: Optional[str]  # None cuando no hay más preguntas
+
+
 class QuizBase(BaseModel):
     title: str
 
 
+class QuizExport(QuizBase):
+    """Una línea del export NDJSON: quiz con sus preguntas, sin ids"""
+    questions: List[QuestionBase] = []
+
+
+class QuizImportResult(BaseModel):
+    quizzes: int
+    questions: int
+
+
 class QuizResponse(BaseModel):
     id: int
     title: str
@@ -48,6 +63,17 @@ class QuizResponse(BaseModel):
         from_attributes = True
 
 
+class QuizSummaryResponse(BaseModel):
+    """Quiz sin preguntas, para respuestas ligeras"""
+    id: int
+    title: str
+    created_at: datetime
+    user_id: int
+
+    class Config:
+        from_attributes = True
+
+
 class QuizListResponse(BaseModel):
     id: int
     title: str
@@ -56,3 +82,35 @@ class QuizListResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class SearchResult(BaseModel):
+    kind: str  # "quiz", "question" o "choice"
+    quiz_id: int
+    quiz_title: str
+    question_id: Optional[int]
+    match_text: str
+    score: float
+
+
+class GradeAnswer(BaseModel):
+    question_id: int
+    choice_id: Optional[int] = None  # Preguntas de opciones
+    text: Optional[str] = None  # Preguntas de texto
+
+
+class GradeRequest(BaseModel):
+    answers: List[GradeAnswer]
+    snapshot_hash: Optional[str] = None  # Versión publicada que se jugó; sin él, la versión actual
+
+
+class GradeResult(BaseModel):
+    question_id: int
+    is_correct: bool
+
+
+class GradeResponse(BaseModel):
+    correct_answers: int
+    total_questions: int
+    score: int  # Porcentaje 0-100
+    results: List[GradeResult]
@@ -17,3 +17,7 @@ class SharedQuizInfo(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class TrendingQuiz(SharedQuizInfo):
+    recent_attempts: float  # Intentos con decaimiento temporal (vida media TRENDING_HALF_LIFE_HOURS)
@@ -0,0 +1,51 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import datetime
+
+
+class SyncQuiz(BaseModel):
+    id: int
+    title: str
+    created_at: datetime
+    updated_at: datetime
+    share_code: Optional[str]
+    is_public: bool
+
+    class Config:
+        from_attributes = True
+
+
+class SyncQuestion(BaseModel):
+    id: int
+    quiz_id: int
+    question_text: str
+    answer_type: str
+    position: Optional[int]
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class SyncChoice(BaseModel):
+    id: int
+    question_id: int
+    choice_text: str
+    is_correct: bool
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class SyncDeletion(BaseModel):
+    entity: str  # "quiz", "question" o "choice"; borrar un quiz borra también su árbol
+    id: int
+
+
+class SyncResponse(BaseModel):
+    quizzes: List[SyncQuiz]
+    questions: List[SyncQuestion]
+    choices: List[SyncChoice]
+    deleted: List[SyncDeletion]
+    token: str  # Se envía como ?since= en la siguiente sincronización
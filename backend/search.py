@@ -0,0 +1,109 @@
+"""
+Full-text search over a user's quizzes, questions and choices.
+Uses the indexes created in migrations.create_search_indexes:
+tsvector/trigram GIN on Postgres and FTS5 on SQLite.
+"""
+
+import re
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+
+_POSTGRES_SEARCH = text("""
+    SELECT kind, quiz_id, quiz_title, question_id, match_text, score FROM (
+        SELECT 'quiz' AS kind, qz.id AS quiz_id, qz.title AS quiz_title,
+               NULL::integer AS question_id, qz.title AS match_text,
+               ts_rank(to_tsvector('simple', coalesce(qz.title, '')), plainto_tsquery('simple', :q))
+                   + similarity(qz.title, :q) AS score
+        FROM quizzes qz
+        WHERE qz.user_id = :user_id
+          AND (to_tsvector('simple', coalesce(qz.title, '')) @@ plainto_tsquery('simple', :q)
+               OR qz.title ILIKE :pattern)
+        UNION ALL
+        SELECT 'question', qz.id, qz.title, qs.id, qs.question_text,
+               ts_rank(to_tsvector('simple', coalesce(qs.question_text, '')), plainto_tsquery('simple', :q))
+                   + similarity(qs.question_text, :q)
+        FROM questions qs JOIN quizzes qz ON qz.id = qs.quiz_id
+        WHERE qz.user_id = :user_id
+          AND (to_tsvector('simple', coalesce(qs.question_text, '')) @@ plainto_tsquery('simple', :q)
+               OR qs.question_text ILIKE :pattern)
+        UNION ALL
+        SELECT 'choice', qz.id, qz.title, qs.id, c.choice_text,
+               ts_rank(to_tsvector('simple', coalesce(c.choice_text, '')), plainto_tsquery('simple', :q))
+                   + similarity(c.choice_text, :q)
+        FROM choices c
+        JOIN questions qs ON qs.id = c.question_id
+        JOIN quizzes qz ON qz.id = qs.quiz_id
+        WHERE qz.user_id = :user_id
+          AND (to_tsvector('simple', coalesce(c.choice_text, '')) @@ plainto_tsquery('simple', :q)
+               OR c.choice_text ILIKE :pattern)
+    ) hits
+    ORDER BY score DESC, quiz_id, question_id
+    LIMIT :limit OFFSET :offset
+""")
+
+# bm25() de FTS5 devuelve valores negativos: cuanto menor, más relevante
+_SQLITE_SEARCH = text("""
+    SELECT kind, quiz_id, quiz_title, question_id, match_text, score FROM (
+        SELECT 'quiz' AS kind, qz.id AS quiz_id, qz.title AS quiz_title,
+               NULL AS question_id, qz.title AS match_text, -bm25(quizzes_fts) AS score
+        FROM quizzes_fts JOIN quizzes qz ON qz.id = quizzes_fts.rowid
+        WHERE quizzes_fts MATCH :match AND qz.user_id = :user_id
+        UNION ALL
+        SELECT 'question', qz.id, qz.title, qs.id, qs.question_text, -bm25(questions_fts)
+        FROM questions_fts
+        JOIN questions qs ON qs.id = questions_fts.rowid
+        JOIN quizzes qz ON qz.id = qs.quiz_id
+        WHERE questions_fts MATCH :match AND qz.user_id = :user_id
+        UNION ALL
+        SELECT 'choice', qz.id, qz.title, qs.id, c.choice_text, -bm25(choices_fts)
+        FROM choices_fts
+        JOIN choices c ON c.id = choices_fts.rowid
+        JOIN questions qs ON qs.id = c.question_id
+        JOIN quizzes qz ON qz.id = qs.quiz_id
+        WHERE choices_fts MATCH :match AND qz.user_id = :user_id
+    )
+    ORDER BY score DESC, quiz_id, question_id
+    LIMIT :limit OFFSET :offset
+""")
+
+
+def _like_pattern(query: str) -> str:
+    """Escape LIKE wildcards so the query is matched as a literal substring."""
+    escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _fts5_match(query: str) -> str | None:
+    """Build an FTS5 MATCH expression: every word as a quoted prefix term."""
+    words = re.findall(r"\w+", query)
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def search_user_content(db: Session, user_id: int, query: str, limit: int, offset: int) -> list:
+    """Return ranked search hits for the user's quizzes, questions and choices."""
+    dialect = db.get_bind().dialect.name
+
+    if dialect == "postgresql":
+        rows = db.execute(_POSTGRES_SEARCH, {
+            "q": query,
+            "pattern": _like_pattern(query),
+            "user_id": user_id,
+            "limit": limit,
+            "offset": offset,
+        })
+    else:
+        match = _fts5_match(query)
+        if match is None:
+            return []
+        rows = db.execute(_SQLITE_SEARCH, {
+            "match": match,
+            "user_id": user_id,
+            "limit": limit,
+            "offset": offset,
+        })
+
+    return rows.mappings().all()
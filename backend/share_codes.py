@@ -0,0 +1,184 @@
+"""
+In-memory set of active share codes, so probes for unknown codes get a 404
+without a database query.
+
+Codes are packed into 64-bit integers and kept in a sorted array (8 bytes
+per code, binary search). Unlike a Bloom filter it has no false positives
+and supports removal on revoke. Every worker rebuilds it at startup and
+periodically. Changes travel on the cache invalidation bus as explicit
+keys: generate-code sends added_key(code), revoke and quiz deletion send
+removed_key(code), so every worker applies them once their NOTIFY arrives.
+"""
+
+import asyncio
+import os
+import string
+import threading
+from array import array
+from bisect import bisect_left
+
+import cache
+from database import engine, session_local
+import models
+
+REFRESH_INTERVAL = float(os.getenv("SHARE_FILTER_REFRESH_SECONDS", "300"))
+
+# Cualquier código de hasta 8 caracteres alfanuméricos cabe en 64 bits (base 37)
+_ALPHABET = {c: i + 1 for i, c in enumerate(string.ascii_uppercase + string.digits)}
+_MAX_LENGTH = 8
+
+_ADDED = "share_code_added:"
+_REMOVED = "share_code_removed:"
+
+
+def _pack(code: str) -> int | None:
+    if not 0 < len(code) <= _MAX_LENGTH:
+        return None
+    value = 0
+    for char in code:
+        digit = _ALPHABET.get(char)
+        if digit is None:
+            return None
+        value = value * 37 + digit
+    return value
+
+
+class ShareCodeFilter:
+    def __init__(self):
+        self._codes = array("Q")
+        self._other: set[str] = set()  # Códigos que no se pueden empaquetar (no debería haber)
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+        self._pending: list[str] | None = None
+        self.ready = False
+        self.counters = {"rejected": 0, "passed": 0, "bypassed": 0, "false_positives": 0}
+
+    def rebuild(self):
+        """Reload every assigned share code from the database."""
+        with self._rebuild_lock:
+            # Los códigos añadidos durante la consulta se aplican también al array nuevo
+            with self._lock:
+                self._pending = []
+            db = session_local()
+            try:
+                rows = db.query(models.Quizzes.share_code).filter(
+                    models.Quizzes.share_code.isnot(None)
+                ).all()
+            except Exception:
+                with self._lock:
+                    self._pending = None
+                raise
+            finally:
+                db.close()
+
+            codes, other = [], set()
+            for (code,) in rows:
+                packed = _pack(code)
+                if packed is None:
+                    other.add(code)
+                else:
+                    codes.append(packed)
+
+            with self._lock:
+                for code in self._pending:
+                    packed = _pack(code)
+                    if packed is None:
+                        other.add(code)
+                    else:
+                        codes.append(packed)
+                self._codes = array("Q", sorted(set(codes)))
+                self._other = other
+                self._pending = None
+                self.ready = True
+
+    def add(self, code: str):
+        packed = _pack(code)
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(code)
+            if packed is None:
+                self._other.add(code)
+                return
+            index = bisect_left(self._codes, packed)
+            if index == len(self._codes) or self._codes[index] != packed:
+                self._codes.insert(index, packed)
+
+    def discard(self, code: str):
+        packed = _pack(code)
+        with self._lock:
+            if packed is None:
+                self._other.discard(code)
+                return
+            index = bisect_left(self._codes, packed)
+            if index < len(self._codes) and self._codes[index] == packed:
+                del self._codes[index]
+
+    def might_contain(self, code: str) -> bool:
+        """False only if the code is certainly not assigned to any quiz."""
+        # Sin bus de invalidación activo no se conocen los códigos de otros workers
+        if not self.ready or (engine.dialect.name == "postgresql" and not cache.bus_metrics["listener_running"]):
+            self.counters["bypassed"] += 1
+            return True
+        packed = _pack(code)
+        if packed is None:
+            found = code in self._other
+        else:
+            codes = self._codes
+            index = bisect_left(codes, packed)
+            found = index < len(codes) and codes[index] == packed
+        self.counters["passed" if found else "rejected"] += 1
+        return found
+
+    def record_false_positive(self):
+        """The filter let a code through but the database did not have it (revoked in another worker)."""
+        self.counters["false_positives"] += 1
+
+    def metrics(self) -> dict:
+        passed = self.counters["passed"]
+        return {
+            "ready": self.ready,
+            "codes": len(self._codes) + len(self._other),
+            "memory_bytes": len(self._codes) * self._codes.itemsize,
+            "false_positive_rate": round(self.counters["false_positives"] / passed, 6) if passed else 0.0,
+            **self.counters,
+        }
+
+
+share_code_filter = ShareCodeFilter()
+
+
+def added_key(code: str) -> str:
+    """Bus key that adds a newly assigned code to every worker's filter."""
+    return _ADDED + code
+
+
+def removed_key(code: str) -> str:
+    """Bus key that removes a revoked or deleted code from every worker's filter."""
+    return _REMOVED + code
+
+
+@cache.on_evict
+def _track_share_keys(keys):
+    if keys is None:
+        # Se pudieron perder notificaciones: no filtrar hasta recargar desde la base de datos
+        share_code_filter.ready = False
+        try:
+            share_code_filter.rebuild()
+        except Exception as e:
+            print(f"[ShareCodes] Rebuild failed: {e}")
+        return
+    for key in keys:
+        if key.startswith(_ADDED):
+            share_code_filter.add(key[len(_ADDED):])
+        elif key.startswith(_REMOVED):
+            share_code_filter.discard(key[len(_REMOVED):])
+
+
+async def refresh_periodically():
+    """Rebuild the filter at startup and every REFRESH_INTERVAL seconds."""
+    while True:
+        try:
+            await asyncio.to_thread(share_code_filter.rebuild)
+        except Exception as e:
+            print(f"[ShareCodes] Rebuild failed: {e}")
+        await asyncio.sleep(REFRESH_INTERVAL)
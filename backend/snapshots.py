@@ -0,0 +1,124 @@
+"""
+Immutable, content-addressed snapshots of published quizzes.
+A snapshot is the QuizResponse JSON of a quiz frozen at publish time,
+stored under the sha256 of its bytes, so it never changes once written.
+"""
+
+import hashlib
+from typing import Iterator
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from cache import response_cache
+from schemas.quiz import QuizResponse, QuestionResponse, ChoiceResponse
+import models
+
+
+def build_quiz_responses(db: Session, quizzes: list[models.Quizzes]) -> list[QuizResponse]:
+    """Load the trees of several quizzes with two queries (all questions, then all their choices)."""
+    quiz_ids = [quiz.id for quiz in quizzes]
+    if not quiz_ids:
+        return []
+    questions = db.query(models.Questions).filter(
+        models.Questions.quiz_id.in_(quiz_ids)
+    ).order_by(models.Questions.quiz_id, models.Questions.position, models.Questions.id).all()
+
+    choices_by_question: dict[int, list[ChoiceResponse]] = {q.id: [] for q in questions}
+    choices = db.query(models.Choices).join(
+        models.Questions, models.Questions.id == models.Choices.question_id
+    ).filter(
+        models.Questions.quiz_id.in_(quiz_ids)
+    ).order_by(models.Choices.id).all()
+    for c in choices:
+        choices_by_question[c.question_id].append(ChoiceResponse(
+            id=c.id,
+            choice_text=c.choice_text,
+            is_correct=c.is_correct,
+            question_id=c.question_id
+        ))
+
+    questions_by_quiz: dict[int, list[QuestionResponse]] = {quiz_id: [] for quiz_id in quiz_ids}
+    for q in questions:
+        questions_by_quiz[q.quiz_id].append(QuestionResponse(
+            id=q.id,
+            question_text=q.question_text,
+            answer_type=q.answer_type,
+            quiz_id=q.quiz_id,
+            choices=choices_by_question[q.id]
+        ))
+
+    return [QuizResponse(
+        id=quiz.id,
+        title=quiz.title,
+        created_at=quiz.created_at,
+        user_id=quiz.user_id,
+        questions=questions_by_quiz[quiz.id]
+    ) for quiz in quizzes]
+
+
+def build_quiz_response(db: Session, quiz: models.Quizzes) -> QuizResponse:
+    """Load the quiz tree with two queries (questions, then all their choices)."""
+    return build_quiz_responses(db, [quiz])[0]
+
+
+def publish_snapshot(db: Session, quiz: models.Quizzes) -> str:
+    """
+    Freeze the current tree of the quiz and point quiz.snapshot_hash at it.
+    Publishing an unchanged quiz reuses the existing snapshot. Does not commit.
+    """
+    content = build_quiz_response(db, quiz).model_dump_json().encode("utf-8")
+    snapshot_hash = hashlib.sha256(content).hexdigest()
+
+    # Idempotente aunque dos peticiones publiquen la misma versión a la vez
+    dialect_insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    db.execute(
+        dialect_insert(models.QuizSnapshots)
+        .values(hash=snapshot_hash, quiz_id=quiz.id, content=content)
+        .on_conflict_do_nothing(index_elements=["hash"])
+    )
+
+    quiz.snapshot_hash = snapshot_hash
+    return snapshot_hash
+
+
+def get_snapshot_content(db: Session, snapshot_hash: str) -> bytes | None:
+    """Return the snapshot JSON bytes. Snapshots are immutable, so they are cached by hash."""
+    key = f"snapshot:{snapshot_hash}"
+    content = response_cache.get(key)
+    if content is not None:
+        return content
+
+    token = response_cache.begin()
+    snapshot = db.get(models.QuizSnapshots, snapshot_hash)
+    if snapshot is None:
+        return None
+    response_cache.set(key, snapshot.content, token)
+    return snapshot.content
+
+
+def get_snapshot_contents(db: Session, snapshot_hashes: list[str]) -> dict[str, bytes]:
+    """Batch version of get_snapshot_content: one query for the snapshots not cached yet."""
+    contents = {}
+    missing = []
+    for snapshot_hash in snapshot_hashes:
+        content = response_cache.get(f"snapshot:{snapshot_hash}")
+        if content is None:
+            missing.append(snapshot_hash)
+        else:
+            contents[snapshot_hash] = content
+
+    if missing:
+        token = response_cache.begin()
+        for snapshot in db.query(models.QuizSnapshots).filter(models.QuizSnapshots.hash.in_(missing)):
+            response_cache.set(f"snapshot:{snapshot.hash}", snapshot.content, token)
+            contents[snapshot.hash] = snapshot.content
+    return contents
+
+
+def json_array(items) -> Iterator[bytes]:
+    """Stream already-serialized JSON documents as one JSON array."""
+    yield b"["
+    for index, item in enumerate(items):
+        yield item if index == 0 else b"," + item
+    yield b"]"
@@ -0,0 +1,145 @@
+"""
+Delta sync of a user's library for offline-first clients.
+
+Quizzes, questions and choices carry an updated_at timestamp, and every
+change below a quiz also touches the quiz. A sync therefore finds the
+changed quizzes through the (user_id, updated_at) index and only looks
+for changed questions and choices inside them, so its cost follows the
+number of changes, not the size of the library. Deletes stay physical
+and leave a tombstone in deleted_entities. Tombstones are kept for
+SYNC_TOMBSTONE_RETENTION_DAYS; a client whose token is older than that
+gets 410 Gone and must do a full sync.
+"""
+
+import asyncio
+import base64
+import os
+from datetime import datetime, timedelta, timezone
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from database import engine
+from schemas.sync import SyncResponse, SyncQuiz, SyncQuestion, SyncChoice, SyncDeletion
+import models
+
+# now() es la hora de inicio de la transacción: una escritura que empezó antes
+# de la sincronización pero confirma después queda con una fecha anterior al
+# token. El token se retrasa este margen para volver a leer esa ventana; los
+# clientes aplican los cambios de forma idempotente.
+SYNC_SAFETY_SECONDS = float(os.getenv("SYNC_SAFETY_SECONDS", "5"))
+
+SYNC_TOMBSTONE_RETENTION_DAYS = float(os.getenv("SYNC_TOMBSTONE_RETENTION_DAYS", "90"))
+
+PRUNE_INTERVAL = float(os.getenv("SYNC_PRUNE_SECONDS", str(24 * 3600)))
+
+# Lápidas borradas por transacción
+PRUNE_BATCH_SIZE = 5000
+
+
+def touch(*rows):
+    """Mark rows as changed even if none of their columns did."""
+    for row in rows:
+        row.updated_at = func.now()
+
+
+def record_deletions(db: Session, user_id: int, entity: str, ids: list[int]):
+    """Leave tombstones for rows about to be deleted. Does not commit."""
+    if ids:
+        db.execute(insert(models.DeletedEntities), [
+            {"user_id": user_id, "entity": entity, "entity_id": entity_id} for entity_id in ids
+        ])
+
+
+def encode_token(moment: datetime) -> str:
+    return base64.urlsafe_b64encode(moment.isoformat().encode()).decode()
+
+
+def _as_utc(moment: datetime) -> datetime:
+    # SQLite devuelve fechas sin zona horaria (en UTC)
+    return moment if moment.tzinfo is not None else moment.replace(tzinfo=timezone.utc)
+
+
+def decode_token(token: str) -> datetime:
+    try:
+        moment = datetime.fromisoformat(base64.urlsafe_b64decode(token.encode()).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid sync token")
+    return _as_utc(moment)
+
+
+def changes_since(db: Session, user_id: int, token: str | None) -> SyncResponse:
+    """Everything that changed in the user's library after the token (all of it without one)."""
+    now = _as_utc(db.query(func.now()).scalar())
+    next_token = encode_token(now - timedelta(seconds=SYNC_SAFETY_SECONDS))
+    since = decode_token(token) if token else None
+
+    # Las lápidas anteriores pueden estar ya borradas: los borrados se perderían
+    if since is not None and since < now - timedelta(days=SYNC_TOMBSTONE_RETENTION_DAYS):
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Sync token expired, full sync required"
+        )
+
+    changed_quizzes = [models.Quizzes.user_id == user_id]
+    if since is not None:
+        changed_quizzes.append(models.Quizzes.updated_at > since)
+
+    quizzes = db.query(models.Quizzes).filter(*changed_quizzes).order_by(models.Quizzes.id).all()
+
+    questions_query = db.query(models.Questions).join(
+        models.Quizzes, models.Quizzes.id == models.Questions.quiz_id
+    ).filter(*changed_quizzes)
+    choices_query = db.query(models.Choices).join(
+        models.Questions, models.Questions.id == models.Choices.question_id
+    ).join(
+        models.Quizzes, models.Quizzes.id == models.Questions.quiz_id
+    ).filter(*changed_quizzes)
+    deleted = []
+    if since is not None:
+        questions_query = questions_query.filter(models.Questions.updated_at > since)
+        choices_query = choices_query.filter(models.Choices.updated_at > since)
+        deleted = db.query(models.DeletedEntities).filter(
+            models.DeletedEntities.user_id == user_id,
+            models.DeletedEntities.deleted_at > since
+        ).order_by(models.DeletedEntities.id).all()
+
+    return SyncResponse(
+        quizzes=[SyncQuiz.model_validate(q) for q in quizzes],
+        questions=[SyncQuestion.model_validate(q) for q in questions_query.order_by(models.Questions.id)],
+        choices=[SyncChoice.model_validate(c) for c in choices_query.order_by(models.Choices.id)],
+        deleted=[SyncDeletion(entity=d.entity, id=d.entity_id) for d in deleted],
+        token=next_token
+    )
+
+
+def prune_tombstones(retention_days: float = SYNC_TOMBSTONE_RETENTION_DAYS) -> int:
+    """Delete tombstones older than the retention window, one batch per transaction."""
+    total = 0
+    with engine.connect() as conn:
+        cutoff = conn.execute(select(func.now())).scalar() - timedelta(days=retention_days)
+        while True:
+            ids = conn.execute(
+                select(models.DeletedEntities.id)
+                .where(models.DeletedEntities.deleted_at < cutoff)
+                .limit(PRUNE_BATCH_SIZE)
+            ).scalars().all()
+            if not ids:
+                break
+            conn.execute(delete(models.DeletedEntities).where(models.DeletedEntities.id.in_(ids)))
+            conn.commit()
+            total += len(ids)
+    if total:
+        print(f"[Sync] Pruned {total} tombstones older than {retention_days:g} days")
+    return total
+
+
+async def prune_periodically():
+    """Daily task: apply SYNC_TOMBSTONE_RETENTION_DAYS."""
+    while True:
+        try:
+            await asyncio.to_thread(prune_tombstones)
+        except Exception as e:
+            print(f"[Sync] Tombstone pruning failed: {e}")
+        await asyncio.sleep(PRUNE_INTERVAL)
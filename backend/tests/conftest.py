@@ -0,0 +1,11 @@
+import os
+import sys
+import tempfile
+
+# La app lee DATABASE_URL al importarse: por defecto una base SQLite temporal,
+# o la base indicada en TEST_DATABASE_URL (p. ej. un Postgres de pruebas)
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL") or \
+    f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}"
+os.environ.setdefault("SECRET_KEY", "test-secret")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
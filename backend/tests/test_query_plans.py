@@ -0,0 +1,146 @@
+"""
+Query plans of the router queries on indexed paths.
+
+Seeds a database through the API, records every SELECT the endpoints run
+and checks that none of them scans a whole table: no "SCAN <table>" in
+SQLite's EXPLAIN QUERY PLAN, no "Seq Scan" in Postgres's EXPLAIN (with
+sequential scans disabled, so they only show up when no index applies).
+
+    pytest tests/test_query_plans.py
+    TEST_DATABASE_URL=postgresql+psycopg2://... pytest tests/test_query_plans.py
+"""
+
+import re
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from database import engine
+import main
+
+QUESTIONS = 5
+
+# Las tablas FTS5 se recorren como tablas virtuales; con MATCH ("M" tras los dos puntos) solo leen el índice invertido
+_SQLITE_SCAN = re.compile(
+    r"^SCAN (?:TABLE )?(?!CONSTANT ROW)(\w+)\b(?! USING (?:COVERING )?INDEX)(?! VIRTUAL TABLE INDEX \d+:\S*M)"
+)
+_POSTGRES_SCAN = re.compile(r"Seq Scan on (\w+)")
+
+
+class StatementRecorder:
+    def __init__(self):
+        self.statements = []
+        self.recording = False
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if self.recording and not executemany and statement.lstrip().upper().startswith("SELECT"):
+            self.statements.append((statement, parameters))
+
+    def record(self, client, method, url, **kwargs):
+        self.statements.clear()
+        self.recording = True
+        try:
+            response = client.request(method, url, **kwargs)
+        finally:
+            self.recording = False
+        assert response.status_code < 400, response.text
+        return list(self.statements)
+
+
+@pytest.fixture(scope="module")
+def recorder():
+    recorder = StatementRecorder()
+    event.listen(engine, "before_cursor_execute", recorder)
+    yield recorder
+    event.remove(engine, "before_cursor_execute", recorder)
+
+
+@pytest.fixture(scope="module")
+def seeded():
+    client = TestClient(main.app)
+    client.post("/auth/register", json={"email": "plans@example.com", "password": "pw", "name": "Plans"})
+    token = client.post("/auth/login", json={"email": "plans@example.com", "password": "pw"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    quiz = client.post("/quizzes/", json={"title": "Capitales"}, headers=headers).json()
+    questions = [
+        client.post(f"/quizzes/{quiz['id']}/questions/", json={
+            "question_text": f"Pregunta {i}",
+            "choices": [{"choice_text": "Lima", "is_correct": True}, {"choice_text": "Quito", "is_correct": False}]
+        }, headers=headers).json()
+        for i in range(QUESTIONS)
+    ]
+    code = client.post(f"/share/{quiz['id']}/generate-code", headers=headers).json()["share_code"]
+    answers = [
+        {"question_id": q["id"], "choice_id": q["choices"][0]["id"]}
+        for q in questions
+    ]
+    client.post("/history/", json={
+        "quiz_id": quiz["id"], "quiz_title": quiz["title"], "score": 100,
+        "correct_answers": QUESTIONS, "total_questions": QUESTIONS, "time_spent": 30, "answers": answers
+    }, headers=headers)
+    return client, headers, quiz, code
+
+
+def scanned_tables(statement, parameters) -> list[str]:
+    with engine.connect() as conn:
+        if conn.dialect.name == "postgresql":
+            conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+            plan = conn.exec_driver_sql("EXPLAIN " + statement, parameters).scalars().all()
+            return [m.group(1) for line in plan for m in [_POSTGRES_SCAN.search(line)] if m]
+        plan = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+        return [m.group(1) for row in plan for m in [_SQLITE_SCAN.match(row[-1])] if m]
+
+
+def search_available() -> bool:
+    """La búsqueda en Postgres necesita la extensión pg_trgm (creada por las migraciones)."""
+    if engine.dialect.name != "postgresql":
+        return True
+    with engine.connect() as conn:
+        return conn.exec_driver_sql("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'").first() is not None
+
+
+def test_detects_full_table_scan(seeded):
+    # Sin índice en title: el plan tiene que delatarlo
+    assert scanned_tables("SELECT id FROM quizzes WHERE title = 'Capitales'", ()) == ["quizzes"]
+    if engine.dialect.name == "sqlite":
+        # Tabla FTS5 sin MATCH: recorrido completo
+        assert scanned_tables("SELECT rowid FROM quizzes_fts", ()) == ["quizzes_fts"]
+
+
+ENDPOINTS = [
+    ("GET", "/auth/me"),
+    ("GET", "/quizzes/"),
+    ("GET", "/quizzes/search?q=Lima"),
+    ("GET", "/quizzes/{quiz_id}"),
+    ("GET", "/quizzes/{quiz_id}/questions?limit=2"),
+    ("GET", "/quizzes/{quiz_id}/sample?n=2"),
+    ("GET", "/quizzes/batch?ids={quiz_id}"),
+    ("POST", "/quizzes/{quiz_id}/grade"),
+    ("GET", "/share/code/{code}"),
+    ("GET", "/share/code/{code}/full"),
+    ("GET", "/share/code/{code}/sample?n=2"),
+    ("GET", "/share/batch?codes={code}"),
+    ("GET", "/share/my-shared"),
+    ("GET", "/history/"),
+    ("GET", "/history/stats"),
+    ("GET", "/history/export?format=ndjson&since=2000-01-01T00:00:00Z"),
+    ("GET", "/history/quiz/{quiz_id}/analytics"),
+    ("GET", "/sync"),
+]
+
+
+@pytest.mark.parametrize("method,url", ENDPOINTS)
+def test_no_full_table_scans(seeded, recorder, method, url):
+    client, headers, quiz, code = seeded
+    if url.startswith("/quizzes/search") and not search_available():
+        pytest.skip("pg_trgm no está instalado en este servidor")
+    kwargs = {"headers": headers}
+    if method == "POST":
+        kwargs["json"] = {"answers": []}
+    statements = recorder.record(client, method, url.format(quiz_id=quiz["id"], code=code), **kwargs)
+    assert statements
+
+    for statement, parameters in statements:
+        assert scanned_tables(statement, parameters) == [], statement
@@ -0,0 +1,139 @@
+"""
+Trending public quizzes, ranked by time-decayed attempt counts.
+
+Each attempt saved from a share code adds a weight that halves every
+TRENDING_HALF_LIFE_HOURS. Weights are kept relative to a fixed epoch
+("forward decay"): an attempt at time t weighs exp(DECAY * (t - EPOCH)),
+so old totals never need rescaling and the ranking is the same at any
+instant. Each quiz stores the log of its total, which keeps values
+small and makes ORDER BY score an index scan. Only attempts at public
+quizzes by players other than the owner count, at most one per player
+and quiz every TRENDING_MIN_INTERVAL_MINUTES. The top TRENDING_SIZE
+public quizzes are reloaded into memory every TRENDING_REFRESH_SECONDS,
+so the feed is served without touching quiz_history.
+"""
+
+import asyncio
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from database import session_local
+from schemas.share import TrendingQuiz
+import models
+
+HALF_LIFE = float(os.getenv("TRENDING_HALF_LIFE_HOURS", "24")) * 3600
+DECAY = math.log(2) / HALF_LIFE
+EPOCH = 1_700_000_000  # Referencia fija de la escala (noviembre de 2023)
+
+TRENDING_SIZE = int(os.getenv("TRENDING_SIZE", "50"))
+REFRESH_INTERVAL = float(os.getenv("TRENDING_REFRESH_SECONDS", "60"))
+
+# Un mismo jugador suma como mucho un intento por quiz en este intervalo
+MIN_INTERVAL = timedelta(minutes=float(os.getenv("TRENDING_MIN_INTERVAL_MINUTES", "60")))
+
+
+def _log_weight(timestamp: float) -> float:
+    return DECAY * (timestamp - EPOCH)
+
+
+def _log_add(a: float, b: float) -> float:
+    """log(exp(a) + exp(b)) without overflow."""
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+
+def counts_for_trending(db: Session, quiz: models.Quizzes, user_id: int) -> bool:
+    """Whether an attempt by user_id at quiz may add to its counter (call before saving the attempt)."""
+    if not quiz.is_public or quiz.user_id == user_id:
+        return False
+    recent = db.query(models.QuizHistory.id).filter(
+        models.QuizHistory.user_id == user_id,
+        models.QuizHistory.completed_at > datetime.now(timezone.utc) - MIN_INTERVAL,
+        models.QuizHistory.quiz_id == quiz.id,
+        models.QuizHistory.is_external.is_(True)
+    ).first()
+    return recent is None
+
+
+def record_attempt(db: Session, quiz_id: int):
+    """Add one attempt to the quiz's decayed counter. Does not commit."""
+    weight = _log_weight(time.time())
+    dialect_insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    inserted = db.execute(
+        dialect_insert(models.QuizTrending)
+        .values(quiz_id=quiz_id, score=weight)
+        .on_conflict_do_nothing(index_elements=["quiz_id"])
+    ).rowcount
+    if inserted:
+        return
+
+    # Bloqueo de la fila para no perder intentos concurrentes del mismo quiz
+    row = db.query(models.QuizTrending).filter(
+        models.QuizTrending.quiz_id == quiz_id
+    ).with_for_update().first()
+    row.score = _log_add(row.score, weight)
+
+
+class TrendingFeed:
+    """Top public quizzes, reloaded periodically from quiz_trending."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.items: list[TrendingQuiz] = []
+        self.refreshed_at: float | None = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        db = session_local()
+        try:
+            rows = db.query(models.Quizzes, models.Users.name, models.QuizTrending.score).join(
+                models.QuizTrending, models.QuizTrending.quiz_id == models.Quizzes.id
+            ).outerjoin(
+                models.Users, models.Users.id == models.Quizzes.user_id
+            ).filter(
+                models.Quizzes.is_public.is_(True),
+                models.Quizzes.share_code.isnot(None)
+            ).order_by(models.QuizTrending.score.desc()).limit(self.size).all()
+
+            quiz_ids = [quiz.id for quiz, _, _ in rows]
+            question_counts = dict(db.query(
+                models.Questions.quiz_id, func.count(models.Questions.id)
+            ).filter(
+                models.Questions.quiz_id.in_(quiz_ids)
+            ).group_by(models.Questions.quiz_id).all()) if quiz_ids else {}
+        finally:
+            db.close()
+
+        now = _log_weight(time.time())
+        items = [TrendingQuiz(
+            id=quiz.id,
+            title=quiz.title,
+            created_at=quiz.created_at,
+            owner_name=owner_name or "Desconocido",
+            question_count=question_counts.get(quiz.id, 0),
+            share_code=quiz.share_code,
+            recent_attempts=round(math.exp(score - now), 2)
+        ) for quiz, owner_name, score in rows]
+
+        with self._lock:
+            self.items = items
+            self.refreshed_at = time.time()
+
+
+trending_feed = TrendingFeed(TRENDING_SIZE)
+
+
+async def refresh_periodically():
+    while True:
+        try:
+            await asyncio.to_thread(trending_feed.refresh)
+        except Exception as e:
+            print(f"[Trending] Refresh failed: {e}")
+        await asyncio.sleep(REFRESH_INTERVAL)
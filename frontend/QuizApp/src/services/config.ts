@@ -96,6 +96,21 @@ export const isTokenLoaded = (): boolean => {
   return tokenLoaded;
 };
 
+// ==================== MARCA DE ESCRITURA ====================
+
+// El backend la devuelve tras cada escritura; reenviarla hace que las lecturas
+// siguientes vean esa escritura aunque se sirvan desde la réplica
+const WRITE_MARKER_HEADER = 'X-Write-Marker';
+let writeMarker: string | null = null;
+
+// Guardar la marca de escritura de una respuesta, si la trae
+export const rememberWriteMarker = (response: Response): void => {
+  const marker = response.headers.get(WRITE_MARKER_HEADER);
+  if (marker) {
+    writeMarker = marker;
+  }
+};
+
 // Headers con autenticación
 export const getAuthHeaders = (): Record<string, string> => {
   const token = getToken();
@@ -105,6 +120,9 @@ export const getAuthHeaders = (): Record<string, string> => {
   if (token) {
     headers['Authorization'] = `Bearer ${token}`;
   }
+  if (writeMarker) {
+    headers[WRITE_MARKER_HEADER] = writeMarker;
+  }
   return headers;
 };
 
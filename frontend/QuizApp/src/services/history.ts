@@ -2,7 +2,7 @@
  * Servicios para el historial de quizzes
  */
 
-import { API_URL, getAuthHeaders } from './config';
+import { API_URL, getAuthHeaders, rememberWriteMarker } from './config';
 
 // ==================== HISTORY TYPES ====================
 
@@ -48,6 +48,7 @@ export const saveQuizResult = async (data: QuizHistoryCreate): Promise<QuizHisto
     headers: getAuthHeaders(),
     body: JSON.stringify(data),
   });
+  rememberWriteMarker(response);
 
   if (!response.ok) {
     const error = await response.json();
@@ -91,6 +92,7 @@ export const deleteHistoryEntry = async (historyId: number): Promise<void> => {
     method: 'DELETE',
     headers: getAuthHeaders(),
   });
+  rememberWriteMarker(response);
 
   if (!response.ok) {
     const error = await response.json();
@@ -3,7 +3,7 @@
  */
 
 import { QuizAPI, QuizListAPI, QuestionAPI, ChoiceAPI } from '../types/api';
-import { API_URL, getAuthHeaders, handleFetchError } from './config';
+import { API_URL, getAuthHeaders, handleFetchError, rememberWriteMarker } from './config';
 
 // ==================== QUIZ ENDPOINTS ====================
 
@@ -44,6 +44,7 @@ export const createQuiz = async (title: string): Promise<QuizAPI> => {
     headers: getAuthHeaders(),
     body: JSON.stringify({ title }),
   });
+  rememberWriteMarker(response);
 
   if (!response.ok) {
     const error = await response.json();
@@ -60,6 +61,7 @@ export const updateQuiz = async (id: number, title: string): Promise<QuizAPI> =>
     headers: getAuthHeaders(),
     body: JSON.stringify({ title }),
   });
+  rememberWriteMarker(response);
 
   if (!response.ok) {
     const error = await response.json();
@@ -75,6 +77,7 @@ export const deleteQuiz = async (id: number): Promise<void> => {
     method: 'DELETE',
     headers: getAuthHeaders(),
   });
+  rememberWriteMarker(response);
 
   if (!response.ok) {
     const error = await response.json();
@@ -94,6 +97,7 @@ export const addQuestionToQuiz = async (
     headers: getAuthHeaders(),
     body: JSON.stringify(question),
   });
+  rememberWriteMarker(response);
 
   if (!response.ok) {
     const error = await response.json();
@@ -113,6 +117,7 @@ export const updateQuestion = async (
     headers: getAuthHeaders(),
     body: JSON.stringify(question),
   });
+  rememberWriteMarker(response);
 
   if (!response.ok) {
     const error = await response.json();
@@ -128,6 +133,7 @@ export const deleteQuestion = async (questionId: number): Promise<void> => {
     method: 'DELETE',
     headers: getAuthHeaders(),
   });
+  rememberWriteMarker(response);
 
   if (!response.ok) {
     const error = await response.json();
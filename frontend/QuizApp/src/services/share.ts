@@ -3,7 +3,7 @@
  */
 
 import { QuizAPI, SharedQuizInfo, ShareCodeResponse } from '../types/api';
-import { API_URL, getAuthHeaders } from './config';
+import { API_URL, getAuthHeaders, rememberWriteMarker } from './config';
 
 // ==================== SHARE ENDPOINTS ====================
 
@@ -13,6 +13,7 @@ export const generateShareCode = async (quizId: number): Promise<ShareCodeRespon
     method: 'POST',
     headers: getAuthHeaders(),
   });
+  rememberWriteMarker(response);
 
   if (!response.ok) {
     const error = await response.json();
@@ -28,6 +29,7 @@ export const revokeShareCode = async (quizId: number): Promise<void> => {
     method: 'DELETE',
     headers: getAuthHeaders(),
   });
+  rememberWriteMarker(response);
 
   if (!response.ok) {
     const error = await response.json();